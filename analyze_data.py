@@ -1,157 +1,223 @@
 import pandas as pd
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
 import numpy as np
 import datetime
 import random
-
-# --- Load Excel file ---
-df = pd.read_excel("demo_leads.xlsx", engine='openpyxl')
-
-# --- Extract relevant columns (J=Previous Purchases, K=Time Since Last Purchase, L=Average Purchase Value) ---
-X = df.iloc[:, [9, 10, 11]]  # J=9, K=10, L=11 (0-indexed)
-X.columns = ['Previous Purchases', 'Time Since Last Purchase', 'Average Purchase Value (SEK)']
-
-# --- Step 1: Create target variable for Purchase Score (binary) ---
-y_purchase = X['Time Since Last Purchase'].apply(lambda x: 1 if x < 200 else 0)
-
-# --- Step 2: Scale features for logistic regression ---
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# --- Step 3: Train logistic regression ---
-purchase_model = LogisticRegression()
-purchase_model.fit(X_scaled, y_purchase)
-
-# --- Step 4: Predict Purchase Score ---
-purchase_scores = np.round(purchase_model.predict_proba(X_scaled)[:, 1], 2)
-
-# --- Step 5: Calculate normalized LTV ---
-historical_ltv = df.iloc[:, 9] * df.iloc[:, 11]  # Previous Purchases * Average Purchase Value
-ltv_normalized = (historical_ltv - historical_ltv.min()) / (historical_ltv.max() - historical_ltv.min())
-median = np.median(ltv_normalized)
-ltv_normalized = np.clip(ltv_normalized / (2 * median), 0, 1)
-ltv_normalized = np.round(ltv_normalized, 2)
-
-# --- Step 6: Compute Lead Score with dynamic weighting ---
-lead_score = []
-for p_score, ltv_score in zip(purchase_scores, ltv_normalized):
-    diff = abs(p_score - ltv_score)
-    adjustment = 0.3 * diff
-    if p_score > ltv_score:
-        weight_p = 0.5 + adjustment
-        weight_ltv = 0.5 - adjustment
-    elif ltv_score > p_score:
-        weight_ltv = 0.5 + adjustment
-        weight_p = 0.5 - adjustment
+from cadence import ANCHOR_COLUMN, SCORED_COLUMN, TIER_COLUMN, assign_cadence
+from dedup import deduplicate_leads, print_report
+from feature_cache import CACHE_DIR, load_features, save_features, source_key
+from segments import segment_purchase_scores
+from shards import apply_moments, deduplicated_moments, read_leads, resolve_shards
+from scoring import (build_classifier, build_preprocessor, feature_frame, historical_ltv,
+                     ltv_sketch, ltv_stats_exact, ltv_stats_sketch, normalize_ltv, purchase_target,
+                     quantized_follow_up_tiers, quantized_lead_scores, save_model)
+
+# --- Settings ---
+USE_CATEGORICAL_FEATURES = True  # False = only the three numeric purchase columns (original model)
+LTV_NORMALIZATION = "exact"      # "exact" = full-column median, "sketch" = streaming quantile sketch
+USE_FEATURE_CACHE = True         # reuse the parsed leads and scaled features while the input file is unchanged
+SEGMENT_COLUMN = None            # e.g. "Industry": fit one Purchase Score model per segment (in parallel)
+MIN_SEGMENT_SIZE = 50            # smaller segments keep the global model's scores
+SHARD_WORKERS = None             # processes reading input shards (None = all cores)
+DATE_LAYOUT = "columns"          # "columns" = one column per message date, "cadence" = tier + last contact only
+
+
+def main():
+    # --- Load leads and features (from the feature cache if these exact files were seen before) ---
+    input_file = "demo_leads.xlsx"  # or a glob ("leads/*.xlsx") or manifest of regional workbooks
+    shard_files = resolve_shards(input_file)
+    cache_key = source_key(shard_files, USE_CATEGORICAL_FEATURES)
+    cached = load_features(cache_key) if USE_FEATURE_CACHE else None
+    shard_sketch = None
+
+    if cached is not None:
+        print(f"Using cached features for '{input_file}' ({CACHE_DIR}/{cache_key}).")
+        df, X_scaled, preprocessor = cached['leads'], cached['X'], cached['preprocessor']
+    else:
+        # Map: parse the shards in parallel, each with its partial statistics; reduce: concatenate and merge
+        raw, moments, sketch = read_leads(shard_files, SHARD_WORKERS)
+        if len(shard_files) > 1:
+            print(f"Read {len(raw)} leads from {len(shard_files)} shards.")
+
+        # --- Step 0: Merge duplicate leads (same email) so nobody is scored or emailed twice ---
+        df, duplicate_report = deduplicate_leads(raw)
+        print_report(duplicate_report, len(raw))
+        if not duplicate_report.empty:
+            duplicate_report.to_excel("duplicate_leads_report.xlsx", index=False, engine='openpyxl')
+        moments = deduplicated_moments(moments, raw, df)
+        if duplicate_report.empty:
+            shard_sketch = sketch  # still describes the leads; after merges it is rebuilt in Step 5
+
+        # --- Extract model inputs by name (purchase history + Industry, City, Lead Source) ---
+        X = feature_frame(df, categorical=USE_CATEGORICAL_FEATURES)
+
+        # --- Step 1: Scale numeric features and one-hot encode categorical features (sparse CSR) ---
+        preprocessor = build_preprocessor(categorical=USE_CATEGORICAL_FEATURES)
+        # The scaler uses the exact merged moments, so sharding never changes the scaled features
+        X_scaled = apply_moments(preprocessor.fit(X), moments).transform(X)
+
+        if USE_FEATURE_CACHE:
+            save_features(cache_key, df, X_scaled, historical_ltv(df), df['Time Since Last Purchase'],
+                          preprocessor)
+
+    # --- Step 2: Create target variable for Purchase Score (binary) ---
+    y_purchase = purchase_target(df)
+
+    # --- Step 3: Train logistic regression ---
+    purchase_model = build_classifier(categorical=USE_CATEGORICAL_FEATURES)
+    purchase_model.fit(X_scaled, y_purchase)
+
+    # --- Step 4: Predict Purchase Score ---
+    purchase_scores = np.round(purchase_model.predict_proba(X_scaled)[:, 1], 2)
+
+    # --- Step 4b: Optionally replace them with per-segment models (fitted in parallel) ---
+    if SEGMENT_COLUMN:
+        purchase_scores, segment_summary = segment_purchase_scores(
+            df, SEGMENT_COLUMN, purchase_scores, USE_CATEGORICAL_FEATURES, MIN_SEGMENT_SIZE)
+        print(f"Purchase Score models by {SEGMENT_COLUMN}:")
+        print(segment_summary.to_string(index=False))
+
+    # --- Step 5: Calculate normalized LTV ---
+    ltv = historical_ltv(df)  # Previous Purchases * Average Purchase Value
+    if LTV_NORMALIZATION == "sketch":
+        sketch = shard_sketch if shard_sketch is not None else ltv_sketch(ltv)
+        ltv_min, ltv_max, ltv_median = ltv_stats_sketch(sketch)
+        p25, p75, p90 = sketch.quantiles([0.25, 0.75, 0.9])
+        print(f"LTV median {ltv_median:,.0f} (p25 {p25:,.0f}, p75 {p75:,.0f}, p90 {p90:,.0f}; "
+              f"rank error within +-{sketch.rank_error():.1%})")
     else:
-        weight_p = weight_ltv = 0.5
-    lead_score.append(round(p_score * weight_p + ltv_score * weight_ltv, 2))
-lead_score = np.array(lead_score)
-
-# --- Step 7: Remove existing columns if they exist ---
-columns_to_remove = ['Purchase Score', 'Lifetime Value', 'Lead Score',
-                     'Last Contact Date', 'Next Follow-up Date',
-                     'Promo 1 Date','Promo 2 Date','Promo 3 Date','Promo 4 Date','Promo 5 Date','Promo 6 Date','Promo 7 Date',
-                     'Education Date','Feedback Date','Welcome Date','Swedish/English']
-for col in columns_to_remove:
-    if col in df.columns:
-        df.drop(columns=col, inplace=True)
-
-# --- Step 8: Insert new columns ---
-avg_col_index = df.columns.get_loc('Average Purchase Value (SEK)')
-df.insert(avg_col_index + 1, 'Purchase Score', purchase_scores)
-df.insert(avg_col_index + 2, 'Lifetime Value', ltv_normalized)
-df.insert(avg_col_index + 3, 'Lead Score', lead_score)
-
-# --- Step 9: Format dates and update based on Lead Score ---
-today = datetime.date.today()
-
-def get_random_date(days_range):
-    return today - datetime.timedelta(days=random.randint(1, days_range))
-
-# Initialize columns
-promo_cols = [f'Promo {i} Date' for i in range(1, 8)]
-df['Last Contact Date'] = np.nan
-df['Next Follow-up Date'] = np.nan
-df['Education Date'] = np.nan
-df['Feedback Date'] = np.nan
-df['Welcome Date'] = 'N/A'
-df['Swedish/English'] = np.nan
-for col in promo_cols:
-    df[col] = 'N/A'
-
-for idx, score in enumerate(lead_score):
-    last_contact, next_followup = np.nan, np.nan
-    if 0.8 <= score <= 1.0:
-        last_contact = get_random_date(5)
-        next_followup = last_contact + datetime.timedelta(days=5)
-        step = 5
-        promo_schedule = [last_contact + datetime.timedelta(days=step * i) for i in range(1, 9)]
-        df.at[idx, 'Education Date'] = promo_schedule[1]
-        df.at[idx, 'Feedback Date'] = promo_schedule[5]
-        for i, col in enumerate(promo_cols):
-            df.at[idx, col] = promo_schedule[i]
-    elif 0.7 <= score <= 0.79:
-        last_contact = get_random_date(7)
-        next_followup = last_contact + datetime.timedelta(days=7)
-        step = 7
-        promo_schedule = [last_contact + datetime.timedelta(days=step * i) for i in range(1, 9)]
-        df.at[idx, 'Education Date'] = promo_schedule[1]
-        df.at[idx, 'Feedback Date'] = promo_schedule[3]
-        for i, col in enumerate(promo_cols):
-            df.at[idx, col] = promo_schedule[i]
-    elif 0.6 <= score <= 0.69:
-        last_contact = get_random_date(10)
-        next_followup = last_contact + datetime.timedelta(days=10)
-        df.at[idx, 'Education Date'] = last_contact + datetime.timedelta(days=20)
-        df.at[idx, 'Feedback Date'] = last_contact + datetime.timedelta(days=30)
-        promo_days = [10, 30, 30, 30, 30, 30, 30]
-        prev_date = last_contact
-        for i, col in enumerate(promo_cols):
-            prev_date = prev_date + datetime.timedelta(days=promo_days[i])
-            df.at[idx, col] = prev_date
-    elif 0.4 <= score <= 0.59:
-        last_contact = get_random_date(15)
-        next_followup = last_contact + datetime.timedelta(days=15)
-        df.at[idx, 'Education Date'] = last_contact + datetime.timedelta(days=15)
-        df.at[idx, 'Feedback Date'] = df.at[idx, 'Education Date'] + datetime.timedelta(days=15)
-    else:  # 0-0.39
-        last_contact = get_random_date(30)
-        next_followup = last_contact + datetime.timedelta(days=30)
-        df.at[idx, 'Education Date'] = last_contact + datetime.timedelta(days=30)
-        df.at[idx, 'Feedback Date'] = 'N/A'
-
-    df.at[idx, 'Last Contact Date'] = last_contact
-    df.at[idx, 'Next Follow-up Date'] = next_followup
-
-    # Swedish/English column: 60% chance Swedish, 40% English
-    df.at[idx, 'Swedish/English'] = 'Swedish' if random.random() < 0.6 else 'English'
-
-    # Welcome Date based on Time Since Last Purchase
-    time_since = df.at[idx, 'Time Since Last Purchase']
-    if time_since == 1:
-        df.at[idx, 'Welcome Date'] = today + datetime.timedelta(days=1)
-    elif time_since == 2:
-        df.at[idx, 'Welcome Date'] = today
-
-# --- Step 10: Ensure all date columns are object dtype to allow 'N/A' ---
-all_date_cols = ['Date Added', 'Last Contact Date', 'Next Follow-up Date',
-                 'Education Date', 'Feedback Date', 'Welcome Date'] + promo_cols
-for col in all_date_cols:
-    if col in df.columns:
-        df[col] = df[col].astype(object)
-
-# --- Step 11: Convert actual datetime values to date only, leave 'N/A' ---
-for col in all_date_cols:
-    if col in df.columns:
-        for idx, val in enumerate(df[col]):
-            if isinstance(val, (datetime.datetime, datetime.date)):
-                df.at[idx, col] = val.date() if isinstance(val, datetime.datetime) else val
-            elif pd.isna(val):
-                df.at[idx, col] = 'N/A'
-
-# --- Step 12: Save back to Excel ---
-df.to_excel("demo_leads_scored.xlsx", index=False, engine='openpyxl')
-
-print("All scores, dates, and language assignments have been updated in 'demo_leads_scored.xlsx'.")
+        ltv_min, ltv_max, ltv_median = ltv_stats_exact(ltv)
+    ltv_normalized = normalize_ltv(ltv, ltv_min, ltv_max, ltv_median)
+
+    # --- Step 6: Compute Lead Score with dynamic weighting (table lookup on the 0.01 grid) ---
+    lead_score = quantized_lead_scores(purchase_scores, ltv_normalized)
+
+    # --- Save the fitted model and LTV constants for service.py ---
+    save_model("lead_model.joblib", preprocessor, purchase_model, USE_CATEGORICAL_FEATURES,
+               ltv_min, ltv_max, ltv_median)
+
+    # --- Step 7: Remove existing columns if they exist ---
+    columns_to_remove = ['Purchase Score', 'Lifetime Value', 'Lead Score',
+                         'Last Contact Date', 'Next Follow-up Date',
+                         'Promo 1 Date','Promo 2 Date','Promo 3 Date','Promo 4 Date','Promo 5 Date','Promo 6 Date','Promo 7 Date',
+                         'Education Date','Feedback Date','Welcome Date','Swedish/English',
+                         TIER_COLUMN, SCORED_COLUMN]
+    for col in columns_to_remove:
+        if col in df.columns:
+            df.drop(columns=col, inplace=True)
+
+    # --- Step 8: Insert new columns ---
+    avg_col_index = df.columns.get_loc('Average Purchase Value (SEK)')
+    df.insert(avg_col_index + 1, 'Purchase Score', purchase_scores)
+    df.insert(avg_col_index + 2, 'Lifetime Value', ltv_normalized)
+    df.insert(avg_col_index + 3, 'Lead Score', lead_score)
+
+    # --- Step 9: Format dates and update based on Lead Score ---
+    today = datetime.date.today()
+
+    if DATE_LAYOUT == "cadence":
+        # Store only the tier and its anchor dates; cadence.py derives every message date from them
+        tier = quantized_follow_up_tiers(purchase_scores, ltv_normalized)
+        tier, last_contact = assign_cadence(tier, today)
+        df[TIER_COLUMN] = tier
+        df[ANCHOR_COLUMN] = pd.to_datetime(last_contact).date
+        df[SCORED_COLUMN] = today
+        df['Swedish/English'] = np.where(np.random.random(len(df)) < 0.6, 'Swedish', 'English')
+        if 'Date Added' in df.columns:
+            df['Date Added'] = pd.to_datetime(df['Date Added']).dt.date
+        df.to_excel("demo_leads_scored.xlsx", index=False, engine='openpyxl')
+        print("All scores, follow-up tiers and language assignments have been updated in 'demo_leads_scored.xlsx'.")
+        return
+
+    def get_random_date(days_range):
+        return today - datetime.timedelta(days=random.randint(1, days_range))
+
+    # Initialize columns
+    promo_cols = [f'Promo {i} Date' for i in range(1, 8)]
+    df['Last Contact Date'] = np.nan
+    df['Next Follow-up Date'] = np.nan
+    df['Education Date'] = np.nan
+    df['Feedback Date'] = np.nan
+    df['Welcome Date'] = 'N/A'
+    df['Swedish/English'] = np.nan
+    for col in promo_cols:
+        df[col] = 'N/A'
+
+    for idx, score in enumerate(lead_score):
+        last_contact, next_followup = np.nan, np.nan
+        if 0.8 <= score <= 1.0:
+            last_contact = get_random_date(5)
+            next_followup = last_contact + datetime.timedelta(days=5)
+            step = 5
+            promo_schedule = [last_contact + datetime.timedelta(days=step * i) for i in range(1, 9)]
+            df.at[idx, 'Education Date'] = promo_schedule[1]
+            df.at[idx, 'Feedback Date'] = promo_schedule[5]
+            for i, col in enumerate(promo_cols):
+                df.at[idx, col] = promo_schedule[i]
+        elif 0.7 <= score <= 0.79:
+            last_contact = get_random_date(7)
+            next_followup = last_contact + datetime.timedelta(days=7)
+            step = 7
+            promo_schedule = [last_contact + datetime.timedelta(days=step * i) for i in range(1, 9)]
+            df.at[idx, 'Education Date'] = promo_schedule[1]
+            df.at[idx, 'Feedback Date'] = promo_schedule[3]
+            for i, col in enumerate(promo_cols):
+                df.at[idx, col] = promo_schedule[i]
+        elif 0.6 <= score <= 0.69:
+            last_contact = get_random_date(10)
+            next_followup = last_contact + datetime.timedelta(days=10)
+            df.at[idx, 'Education Date'] = last_contact + datetime.timedelta(days=20)
+            df.at[idx, 'Feedback Date'] = last_contact + datetime.timedelta(days=30)
+            promo_days = [10, 30, 30, 30, 30, 30, 30]
+            prev_date = last_contact
+            for i, col in enumerate(promo_cols):
+                prev_date = prev_date + datetime.timedelta(days=promo_days[i])
+                df.at[idx, col] = prev_date
+        elif 0.4 <= score <= 0.59:
+            last_contact = get_random_date(15)
+            next_followup = last_contact + datetime.timedelta(days=15)
+            df.at[idx, 'Education Date'] = last_contact + datetime.timedelta(days=15)
+            df.at[idx, 'Feedback Date'] = df.at[idx, 'Education Date'] + datetime.timedelta(days=15)
+        else:  # 0-0.39
+            last_contact = get_random_date(30)
+            next_followup = last_contact + datetime.timedelta(days=30)
+            df.at[idx, 'Education Date'] = last_contact + datetime.timedelta(days=30)
+            df.at[idx, 'Feedback Date'] = 'N/A'
+
+        df.at[idx, 'Last Contact Date'] = last_contact
+        df.at[idx, 'Next Follow-up Date'] = next_followup
+
+        # Swedish/English column: 60% chance Swedish, 40% English
+        df.at[idx, 'Swedish/English'] = 'Swedish' if random.random() < 0.6 else 'English'
+
+        # Welcome Date based on Time Since Last Purchase
+        time_since = df.at[idx, 'Time Since Last Purchase']
+        if time_since == 1:
+            df.at[idx, 'Welcome Date'] = today + datetime.timedelta(days=1)
+        elif time_since == 2:
+            df.at[idx, 'Welcome Date'] = today
+
+    # --- Step 10: Ensure all date columns are object dtype to allow 'N/A' ---
+    all_date_cols = ['Date Added', 'Last Contact Date', 'Next Follow-up Date',
+                     'Education Date', 'Feedback Date', 'Welcome Date'] + promo_cols
+    for col in all_date_cols:
+        if col in df.columns:
+            df[col] = df[col].astype(object)
+
+    # --- Step 11: Convert actual datetime values to date only, leave 'N/A' ---
+    for col in all_date_cols:
+        if col in df.columns:
+            for idx, val in enumerate(df[col]):
+                if isinstance(val, (datetime.datetime, datetime.date)):
+                    df.at[idx, col] = val.date() if isinstance(val, datetime.datetime) else val
+                elif pd.isna(val):
+                    df.at[idx, col] = 'N/A'
+
+    # --- Step 12: Save back to Excel ---
+    df.to_excel("demo_leads_scored.xlsx", index=False, engine='openpyxl')
+
+    print("All scores, dates, and language assignments have been updated in 'demo_leads_scored.xlsx'.")
+
+
+# Guarded so worker processes can import this file without rerunning it
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Sample-based estimates with confidence intervals for the approximate PDF report.
+
+Two ways to draw the sample:
+- stratified_sample: Bernoulli sample within every Industry x Lead Source stratum
+  (sampling rate n/N per stratum, with a minimum per stratum so small strata are kept)
+- reservoir_sample: a uniform sample of fixed size kept while streaming chunks of a file
+
+Every sampled row carries the weight N_h / n_h of its stratum (a reservoir sample is
+one stratum). Group means are ratio estimates sum(w*y) / sum(w); their variance uses
+the standard linearization for stratified samples with finite population correction:
+    z_i = 1[i in g] * (y_i - mean_g) / N_g
+    Var(mean_g) = sum_h N_h^2 * (1 - n_h / N_h) * s_h^2(z) / n_h
+Intervals are mean +- 1.96 * sqrt(Var), i.e. 95% confidence.
+"""
+import numpy as np
+import pandas as pd
+
+Z_95 = 1.96
+STRATA_COLUMNS = ['Industry', 'Lead Source']
+
+
+def strata_codes(df, columns=STRATA_COLUMNS):
+    """One integer code per combination of the strata columns (missing values are a stratum too)."""
+    codes = np.zeros(len(df), dtype=np.int64)
+    for col in columns:
+        if col in df.columns:
+            col_codes, uniques = pd.factorize(df[col])
+            codes = codes * (len(uniques) + 1) + (col_codes + 1)  # missing (-1) becomes 0
+    return _dense(codes)
+
+
+def _dense(codes):
+    """Renumber the codes that occur as 0..k-1 (the codes are small, so no hashing)."""
+    present = np.bincount(codes) > 0
+    return (np.cumsum(present) - 1)[codes]
+
+
+def stratified_sample(df, size, columns=STRATA_COLUMNS, min_per_stratum=30, seed=None, prepare=None, where=None):
+    """Sample about `size` rows, proportionally per stratum (at least `min_per_stratum` each).
+
+    Only the strata columns are read for all rows; `prepare` (e.g. binning, derived
+    columns) runs on the sampled rows alone and must keep every row. `where` (a boolean
+    mask) limits the population to some rows without copying the others first.
+    Returns the sampled rows with '_stratum' and '_weight' columns; the stratum sizes
+    are kept in the sample's attrs for the variance estimates.
+    """
+    rng = np.random.default_rng(seed)
+    codes = strata_codes(df, columns)
+    rows = None if where is None else np.flatnonzero(where)
+    if rows is not None:
+        codes = _dense(codes[rows])  # strata with no eligible rows drop out
+    population = np.bincount(codes)
+    target = np.minimum(population, np.maximum(min_per_stratum, population * size / len(codes)))
+    keep = rng.random(len(codes)) < (target / population)[codes]
+
+    picked = df.iloc[np.flatnonzero(keep) if rows is None else rows[keep]]
+    sample = prepare(picked) if prepare else picked.copy()
+    if len(sample) != keep.sum():
+        raise ValueError("prepare must keep every sampled row")
+    sample['_stratum'] = codes[keep]
+    return _with_weights(sample, population)
+
+
+def reservoir_sample(chunks, size, seed=None):
+    """Uniform sample of `size` rows from an iterable of DataFrame chunks.
+
+    Every row gets a random key and the reservoir keeps the `size` rows with the
+    smallest keys (equivalent to Algorithm R). Only the reservoir and one chunk are
+    in memory, so the input can be larger than memory.
+    """
+    rng = np.random.default_rng(seed)
+    reservoir, keys, seen = None, np.empty(0), 0
+    for chunk in chunks:
+        seen += len(chunk)
+        chunk_keys = rng.random(len(chunk))
+        reservoir = chunk if reservoir is None else pd.concat([reservoir, chunk], ignore_index=True)
+        keys = np.concatenate([keys, chunk_keys])
+        if len(keys) > size:
+            keep = np.argpartition(keys, size - 1)[:size]
+            reservoir, keys = reservoir.iloc[keep].reset_index(drop=True), keys[keep]
+
+    if reservoir is None:
+        raise ValueError("No rows to sample")
+    reservoir = reservoir.reset_index(drop=True)
+    reservoir['_stratum'] = 0
+    return _with_weights(reservoir, np.array([seen]))
+
+
+def _with_weights(sample, population):
+    sampled = np.bincount(sample['_stratum'], minlength=len(population))
+    sample['_weight'] = population[sample['_stratum']] / sampled[sample['_stratum']]
+    sample.attrs['population'] = population
+    sample.attrs['sampled'] = sampled
+    return sample
+
+
+def estimate_means(sample, value_column, group_column=None):
+    """Estimated mean of `value_column` per group (or overall) with a 95% CI half-width.
+
+    Returns a DataFrame with 'sum' and 'count' (estimated population totals, so that
+    sum / count is the estimated mean), 'mean', 'sampled' (rows in the sample) and 'ci'.
+    The interval is NaN for groups with fewer than two sampled rows.
+    """
+    population, sampled = sample.attrs['population'], sample.attrs['sampled']
+    values = sample[value_column].to_numpy(dtype=np.float64)
+    groups = sample[group_column] if group_column else pd.Series('All', index=sample.index)
+    valid = ~np.isnan(values) & groups.notna().to_numpy()
+    values, strata = values[valid], sample['_stratum'].to_numpy()[valid]
+    weights = sample['_weight'].to_numpy()[valid]
+    codes, names = pd.factorize(groups[valid], sort=True)
+
+    # One bincount pass per statistic instead of a groupby per group
+    count = np.bincount(codes, weights=weights, minlength=len(names))
+    total = np.bincount(codes, weights=weights * values, minlength=len(names))
+    mean = total / count
+
+    # Linearized values z per (group, stratum); rows outside the group have z = 0
+    z = (values - mean[codes]) / count[codes]
+    cell = codes * len(population) + strata
+    z_sum = np.bincount(cell, weights=z, minlength=len(names) * len(population)).reshape(len(names), -1)
+    z2_sum = np.bincount(cell, weights=z ** 2, minlength=len(names) * len(population)).reshape(len(names), -1)
+    n_h, N_h = sampled.astype(float), population.astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s2 = (z2_sum - z_sum ** 2 / n_h) / (n_h - 1)
+        contribution = np.where(n_h > 1, N_h ** 2 * (1 - n_h / N_h) * s2 / n_h, 0.0)
+    variance = np.nan_to_num(contribution).sum(axis=1)
+
+    totals = pd.DataFrame({'sum': total, 'count': count, 'mean': mean,
+                           'sampled': np.bincount(codes, minlength=len(names))},
+                          index=pd.Index(names, name=group_column))
+    totals['ci'] = Z_95 * np.sqrt(variance.clip(min=0))
+    totals.loc[totals['sampled'] < 2, 'ci'] = np.nan
+    return totals
+
+
+def estimate_percentages(sample, category_column, categories):
+    """Estimated percentage of leads in each category, with 95% CI half-widths."""
+    percentages, cis = {}, {}
+    for category in categories:
+        indicator = (sample[category_column] == category).astype(float) * 100
+        estimate = estimate_means(sample.assign(_indicator=indicator), '_indicator').iloc[0]
+        percentages[category], cis[category] = estimate['mean'], estimate['ci']
+    return pd.Series(percentages, dtype=float), pd.Series(cis, dtype=float)
@@ -0,0 +1,96 @@
+"""Exact vs approximate report aggregates, timed end to end from the raw leads.
+
+    python benchmarks/approximate_report.py --rows 10000000 --sample-size 50000 --file-rows 100000
+
+In memory (--rows): the exact path prepares every row (score bins, Revenue) and
+aggregates; the stratified path codes the strata, samples, prepares only the sample
+and estimates. From a file (--file-rows, written as .xlsx and .csv first): the same,
+plus reading the file the way pdf.py does (the exact report reads every column, the
+approximate modes only the report's columns), and the reservoir path that streams it.
+Also reports how many of the exact group averages fall inside the 95% intervals.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from approximate import reservoir_sample  # noqa: E402
+from dedup import read_chunks  # noqa: E402
+from pdf import (REPORT_COLUMNS, approximate_aggregates, compute_aggregates,  # noqa: E402
+                 prepare_leads, read_report_columns, sample_leads, sorted_means)
+from purchase_model_features import synthetic_leads  # noqa: E402
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def leads(rows, cities):
+    df = synthetic_leads(rows, cities)
+    rng = np.random.default_rng(1)
+    df['Lead Score'] = np.round(np.clip(rng.beta(2, 2, len(df)) + (df['Industry'] == 'Bygg') * 0.1, 0, 1), 2)
+    return df
+
+
+def exact_path(df):
+    return compute_aggregates(prepare_leads(df))
+
+
+def stratified_path(df, size):
+    return approximate_aggregates(sample_leads(df, size), "stratified")
+
+
+def coverage(exact, approx):
+    for kind in ['lead_score', 'revenue']:
+        for col in ['Industry', 'Lead Source']:
+            truth = sorted_means(exact[kind][col])
+            estimate = approx[kind][col]
+            error = (estimate['sum'] / estimate['count'] - truth.reindex(estimate.index)).abs()
+            inside = (error <= estimate['ci']).mean() * 100
+            print(f"  {kind:10s} by {col:11s}: {inside:5.1f}% of exact averages inside the 95% interval")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--cities", type=int, default=5000)
+    parser.add_argument("--sample-size", type=int, default=50_000)
+    parser.add_argument("--file-rows", type=int, default=100_000, help="rows in the .xlsx test (0 = skip)")
+    args = parser.parse_args()
+
+    df = leads(args.rows, args.cities)
+    exact, exact_time = timed(lambda: exact_path(df))
+    approx, approx_time = timed(lambda: stratified_path(df, args.sample_size))
+    print(f"In memory, {args.rows:,} rows, sample of {args.sample_size:,} (prepare + aggregate):")
+    print(f"  exact        {exact_time:7.2f} s")
+    print(f"  stratified   {approx_time:7.2f} s   ({exact_time / approx_time:.1f}x faster)")
+    coverage(exact, approx)
+    del df
+
+    if args.file_rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            df = leads(args.file_rows, args.cities)
+            for suffix in ['xlsx', 'csv']:
+                path = os.path.join(tmp, f"leads.{suffix}")
+                if suffix == 'xlsx':
+                    df.to_excel(path, index=False)
+                    read_all = pd.read_excel
+                else:
+                    df.to_csv(path, index=False)
+                    read_all = pd.read_csv
+                _, exact_time = timed(lambda: compute_aggregates(prepare_leads(read_all(path))))
+                _, approx_time = timed(lambda: stratified_path(read_report_columns(path), args.sample_size))
+                _, reservoir_time = timed(lambda: approximate_aggregates(reservoir_sample(
+                    (prepare_leads(chunk) for chunk in read_chunks(path, 100_000, REPORT_COLUMNS)),
+                    args.sample_size), "reservoir"))
+                print(f"From .{suffix}, {args.file_rows:,} rows (read + prepare + aggregate):")
+                print(f"  exact        {exact_time:7.2f} s")
+                print(f"  stratified   {approx_time:7.2f} s   ({exact_time / approx_time:.1f}x faster)")
+                print(f"  reservoir    {reservoir_time:7.2f} s   ({exact_time / reservoir_time:.1f}x faster)")
@@ -0,0 +1,69 @@
+"""Cadence layout (tier + last contact) vs materialized date columns.
+
+    python benchmarks/cadence_due_dates.py --rows 1000000
+Compares memory of the two layouts and the time to find every message due on one
+date: due_on() on the cadence columns, a vectorized comparison of the materialized
+columns, and message.py's original cell-by-cell scan (on a smaller slice).
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cadence import (ANCHOR_COLUMN, DATE_COLUMNS, SCORED_COLUMN, TIER_COLUMN,  # noqa: E402
+                     assign_cadence, date_view, due_on)
+from scoring import follow_up_tier  # noqa: E402
+
+
+def matches_date(cell, selected_date):
+    """message.py's original per-cell check."""
+    if pd.isna(cell) or str(cell).strip().upper() == "N/A":
+        return False
+    try:
+        cell_date = pd.to_datetime(cell).date() if not isinstance(cell, pd.Timestamp) else cell.date()
+    except Exception:
+        return False
+    return cell_date == selected_date
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    today = datetime.date(2025, 10, 1)
+    tier, anchor = assign_cadence(follow_up_tier(rng.random(args.rows).round(2)), today, rng)
+    cadence = pd.DataFrame({TIER_COLUMN: tier, ANCHOR_COLUMN: anchor.astype('datetime64[ns]'),
+                            SCORED_COLUMN: np.datetime64(today, 'ns'),
+                            'Time Since Last Purchase': rng.integers(1, 401, args.rows)})
+    materialized = date_view(cadence)[DATE_COLUMNS].astype('datetime64[ns]')
+    target = today + datetime.timedelta(days=20)
+
+    start = time.perf_counter()
+    lazy = due_on(cadence, target)
+    lazy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = materialized == pd.Timestamp(target)
+    columns_time = time.perf_counter() - start
+
+    legacy = materialized.head(args.legacy_rows)
+    legacy = legacy.astype(object).where(legacy.notna(), 'N/A')
+    start = time.perf_counter()
+    legacy_flags = legacy.map(lambda cell: matches_date(cell, target))
+    legacy_time = (time.perf_counter() - start) * args.rows / args.legacy_rows
+
+    stored = cadence[[TIER_COLUMN, ANCHOR_COLUMN, SCORED_COLUMN]].memory_usage(index=False).sum()
+    print(f"{args.rows:,} leads, {int(lazy.values.sum()):,} messages due on {target}")
+    print(f"same answer as the date columns: {bool((lazy == columns).all().all())} "
+          f"(legacy scan: {bool((legacy_flags == lazy.head(args.legacy_rows)).all().all())})")
+    print(f"stored dates   cadence {stored / 1e6:8.1f} MB   columns {materialized.memory_usage(index=False).sum() / 1e6:8.1f} MB")
+    print(f"due on date    cadence {lazy_time:8.3f} s    columns {columns_time:8.3f} s   "
+          f"cell-by-cell ~{legacy_time:8.1f} s")
@@ -0,0 +1,108 @@
+"""Verify the quantized Lead Score / tier tables and time them against the lead_scores() loop.
+
+    python benchmarks/lead_score_lut.py --rows 1000000
+Every one of the 101 x 101 grid pairs is checked against the baseline formula, written
+out again below rather than taken from scoring.py, for each weighting (exit status 1 on
+any difference). That covers the grid edges 0.00 and 1.00 and the pairs whose weighted
+sum falls halfway between two cents, where rounding decides. Then a batch is scored both ways.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scoring import (GRID_SIZE, WEIGHT_ADJUSTMENT, lead_score_table, lead_scores,  # noqa: E402
+                     quantized_follow_up_tiers, quantized_lead_scores)
+
+
+def reference_lead_score(p_score, ltv_score, weight):
+    """Unrounded and rounded Lead Score, as in the original analyze_data.py (Step 6).
+
+    The scores there come from np.round, so they are NumPy floats, and round() on a
+    NumPy float scales, rounds half to even and scales back. That differs from round()
+    on a Python float for many of the halfway pairs, so the inputs are converted the
+    same way here.
+    """
+    p_score, ltv_score = np.float64(p_score), np.float64(ltv_score)
+    adjustment = weight * abs(p_score - ltv_score)
+    if p_score > ltv_score:
+        weight_p, weight_ltv = 0.5 + adjustment, 0.5 - adjustment
+    elif ltv_score > p_score:
+        weight_p, weight_ltv = 0.5 - adjustment, 0.5 + adjustment
+    else:
+        weight_p = weight_ltv = 0.5
+    value = p_score * weight_p + ltv_score * weight_ltv
+    return value, round(value, 2)
+
+
+def reference_tier(score):
+    """Follow-up tier (index into FOLLOW_UP_TIERS), as in the original analyze_data.py (Step 9)."""
+    if 0.8 <= score <= 1.0:
+        return 0
+    if 0.7 <= score <= 0.79:
+        return 1
+    if 0.6 <= score <= 0.69:
+        return 2
+    if 0.4 <= score <= 0.59:
+        return 3
+    return 4
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--weights", type=float, nargs="+", default=[0.1, 0.2, WEIGHT_ADJUSTMENT, 0.4, 0.5])
+    args = parser.parse_args()
+
+    # --- Full grid against the reference formula, one pair at a time ---
+    failures = 0
+    for weight in args.weights:
+        table = lead_score_table(weight)
+        score_diff = tier_diff = edge_pairs = half_pairs = 0
+        for i in range(GRID_SIZE):
+            for j in range(GRID_SIZE):
+                p, v = i / 100, j / 100
+                value, expected = reference_lead_score(p, v, weight)
+                cents = value * 100
+                half = abs(cents - math.floor(cents) - 0.5) < 1e-6
+                edge = i in (0, GRID_SIZE - 1) or j in (0, GRID_SIZE - 1)
+                score = quantized_lead_scores([p], [v], weight)[0]
+                tier = quantized_follow_up_tiers([p], [v], weight)[0]
+                score_wrong = score != expected or table[i, j] != expected
+                tier_wrong = tier != reference_tier(expected)
+                score_diff += score_wrong
+                tier_diff += tier_wrong
+                edge_pairs += edge
+                half_pairs += half
+                if score_wrong or tier_wrong:
+                    print(f"  p={p:.2f} ltv={v:.2f}: expected {expected}, got {score} (tier {tier})")
+        failures += score_diff + tier_diff
+        print(f"weight {weight}: {GRID_SIZE ** 2} grid pairs ({edge_pairs} on the edges, {half_pairs} halfway "
+              f"between two cents), {score_diff} Lead Score and {tier_diff} tier differences")
+
+    # --- Batch of scores rounded the way analyze_data.py rounds them ---
+    rng = np.random.default_rng(0)
+    p = np.round(rng.random(args.rows), 2)
+    v = np.round(np.clip(rng.random(args.rows) * 1.2, 0, 1), 2)
+
+    start = time.perf_counter()
+    reference = lead_scores(p, v)
+    loop_time = time.perf_counter() - start
+    quantized_lead_scores(p[:1], v[:1])  # builds the table once
+    start = time.perf_counter()
+    scores = quantized_lead_scores(p, v)
+    table_time = time.perf_counter() - start
+    start = time.perf_counter()
+    quantized_follow_up_tiers(p, v)
+    tier_time = time.perf_counter() - start
+
+    failures += int((scores != reference).sum())
+    print(f"\n{args.rows:,} leads: identical to the loop: {bool((scores == reference).all())}")
+    print(f"lead_scores loop    {loop_time:8.3f} s")
+    print(f"table lookup        {table_time:8.3f} s   ({loop_time / table_time:,.0f}x faster)")
+    print(f"tier lookup         {tier_time:8.3f} s")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,83 @@
+"""Load test for service.py on localhost: p50/p99 latency and requests/second.
+
+Start the service first (python service.py), then:
+    python benchmarks/load_test_service.py --requests 20000 --concurrency 64
+Each client keeps one HTTP/1.1 connection open and sends single-lead requests
+(use --batch-size to send several leads per request).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+INDUSTRIES = ["IT-tjänster", "Konsult", "Detaljhandel", "Bygg", "Marknadsföring"]
+LEAD_SOURCES = ["Webbplats", "Rekommendation", "LinkedIn", "Mässa", "Kallkontakt"]
+CITIES = ["Stockholm", "Göteborg", "Malmö", "Uppsala", "Västerås", "Örebro", "Linköping"]
+
+
+def random_lead():
+    return {
+        "Previous Purchases": random.randint(1, 100),
+        "Time Since Last Purchase": random.randint(1, 400),
+        "Average Purchase Value (SEK)": random.randint(400, 10000),
+        "Industry": random.choice(INDUSTRIES),
+        "City": random.choice(CITIES),
+        "Lead Source": random.choice(LEAD_SOURCES),
+    }
+
+
+async def client(host, port, count, batch_size, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            leads = [random_lead() for _ in range(batch_size)]
+            body = json.dumps(leads[0] if batch_size == 1 else leads).encode("utf-8")
+            request = (f"POST /score HTTP/1.1\r\nHost: {host}\r\n"
+                       f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+            start = time.perf_counter()
+            writer.write(request.encode("latin-1") + body)
+            await writer.drain()
+
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if b" 200 " not in status:
+                raise RuntimeError(f"Unexpected response: {status!r}")
+    finally:
+        writer.close()
+
+
+async def main(args):
+    latencies = []
+    per_client = args.requests // args.concurrency
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args.host, args.port, per_client, args.batch_size, latencies)
+                           for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    print(f"{len(ms):,} requests x {args.batch_size} lead(s), {args.concurrency} concurrent clients")
+    print(f"p50 {np.percentile(ms, 50):.2f} ms   p99 {np.percentile(ms, 99):.2f} ms   "
+          f"max {ms.max():.2f} ms")
+    print(f"{len(ms) / elapsed:,.0f} requests/s   {len(ms) * args.batch_size / elapsed:,.0f} leads/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=1, help="leads per request")
+    asyncio.run(main(parser.parse_args()))
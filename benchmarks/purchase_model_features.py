@@ -0,0 +1,83 @@
+"""Fit time and memory of the Purchase Score model at 1M rows.
+
+Compares the original dense three-feature model with the sparse one-hot pipeline
+(Industry, City, Lead Source added). Run from the repository root:
+    python benchmarks/purchase_model_features.py --rows 1000000 --cities 5000 --solvers lbfgs saga liblinear
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scoring import build_classifier, build_preprocessor, feature_frame, purchase_target  # noqa: E402
+
+INDUSTRIES = ["IT-tjänster", "Konsult", "Detaljhandel", "Bygg", "Marknadsföring"]
+LEAD_SOURCES = ["Webbplats", "Rekommendation", "LinkedIn", "Mässa", "Kallkontakt"]
+
+
+def synthetic_leads(rows, cities, seed=0):
+    """Leads with the same distributions as generate_random_data.py (without Faker, for speed)."""
+    rng = np.random.default_rng(seed)
+    p = rng.random(rows)
+    purchases = np.where(p < 0.6, rng.integers(1, 11, rows),
+                         np.where(p < 0.9, rng.integers(11, 51, rows), rng.integers(51, 101, rows)))
+    return pd.DataFrame({
+        'Industry': rng.choice(INDUSTRIES, rows),
+        'City': pd.Categorical.from_codes(rng.integers(0, cities, rows),
+                                          [f"City {i}" for i in range(cities)]).astype(str),
+        'Lead Source': rng.choice(LEAD_SOURCES, rows),
+        'Previous Purchases': purchases,
+        'Time Since Last Purchase': rng.integers(1, 401, rows),
+        'Average Purchase Value (SEK)': rng.integers(400, 10001, rows),
+    })
+
+
+def run(df, categorical, solver=None):
+    y = purchase_target(df)
+    tracemalloc.start()
+    start = time.perf_counter()
+    X = build_preprocessor(categorical).fit_transform(feature_frame(df, categorical))
+    features_done = time.perf_counter()
+    model = build_classifier(categorical)
+    if solver:
+        model.set_params(solver=solver)
+    model.fit(X, y)
+    fit_done = time.perf_counter()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if sparse.issparse(X):
+        matrix_bytes = X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    else:
+        matrix_bytes = X.nbytes
+    return {
+        "features": X.shape[1],
+        "matrix MB": matrix_bytes / 1e6,
+        "transform s": features_done - start,
+        "fit s": fit_done - features_done,
+        "peak MB": peak / 1e6,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--cities", type=int, default=5000)
+    parser.add_argument("--solvers", nargs="+", default=["lbfgs"],
+                        help="solvers to try on the sparse matrix, e.g. lbfgs saga liblinear")
+    args = parser.parse_args()
+
+    df = synthetic_leads(args.rows, args.cities)
+    print(f"{args.rows:,} rows, {args.cities:,} cities")
+    runs = [("dense baseline (3 numeric)", False, None)]
+    runs += [(f"sparse one-hot (CSR) + {s}", True, s) for s in args.solvers]
+    for name, categorical, solver in runs:
+        result = run(df, categorical, solver)
+        print(f"{name:34s} " + "  ".join(f"{k}: {v:,.2f}" if isinstance(v, float) else f"{k}: {v:,}"
+                                         for k, v in result.items()))
@@ -0,0 +1,36 @@
+"""Wall-clock time of per-segment Purchase Score models for different worker counts.
+
+    python benchmarks/segment_scaling.py --rows 1000000 --column Industry
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from purchase_model_features import synthetic_leads  # noqa: E402
+from segments import segment_purchase_scores  # noqa: E402
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--cities", type=int, default=5000)
+    parser.add_argument("--column", default="Industry")
+    args = parser.parse_args()
+
+    df = synthetic_leads(args.rows, args.cities)
+    global_scores = np.zeros(len(df))
+    cores = os.cpu_count() or 1
+    workers = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+
+    print(f"{args.rows:,} rows segmented by {args.column} ({df[args.column].nunique()} segments), "
+          f"{cores} core(s)")
+    baseline = None
+    for n in workers:
+        start = time.perf_counter()
+        segment_purchase_scores(df, args.column, global_scores, workers=n)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{n:2d} worker(s): {elapsed:6.2f} s   speed-up x{baseline / elapsed:.2f}")
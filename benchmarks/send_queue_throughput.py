@@ -0,0 +1,61 @@
+"""Messages per second through the shared send queue for different numbers of operators.
+
+Each operator is a separate process that claims batches, "sends" every message (a fixed
+delay standing in for the manual or SMTP send) and acknowledges it.
+
+    python benchmarks/send_queue_throughput.py --messages 2000 --send-ms 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Process
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from send_queue import SendQueue  # noqa: E402
+
+SEND_DATE = "2025-10-01"
+
+
+def operator(path, name, send_seconds):
+    queue = SendQueue(path)
+    while (claimed := queue.claim(SEND_DATE, name)) is not None:
+        batch_id, messages = claimed
+        for message_id, _, _, _ in messages:
+            if queue.is_pending(message_id):
+                time.sleep(send_seconds)
+                queue.ack(batch_id, message_id, name)
+        queue.finish(batch_id, name)
+    queue.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--send-ms", type=float, default=20.0)
+    parser.add_argument("--operators", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    baseline = None
+    for count in args.operators:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "queue.sqlite")
+            queue = SendQueue(path)
+            queue.enqueue(SEND_DATE, [(i, "Promo 1 Date", f"lead{i}@example.com") for i in range(args.messages)],
+                          args.batch_size)
+
+            start = time.perf_counter()
+            workers = [Process(target=operator, args=(path, f"op{i}", args.send_ms / 1000)) for i in range(count)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+
+            progress = queue.progress(SEND_DATE)
+            queue.close()
+        rate = args.messages / elapsed
+        baseline = baseline or rate
+        print(f"{count:2d} operator(s): {rate:8.1f} messages/s   x{rate / baseline:.2f}   {progress}")
@@ -0,0 +1,38 @@
+"""Reading sharded lead workbooks with different worker counts (map-reduce in shards.py).
+
+    python benchmarks/sharded_input.py --shards 8 --rows-per-shard 20000
+Also checks that the merged shard moments equal the moments of the concatenated table.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from purchase_model_features import synthetic_leads  # noqa: E402
+from shards import numeric_moments, read_leads  # noqa: E402
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--rows-per-shard", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.shards):
+            path = os.path.join(tmp, f"region_{i}.xlsx")
+            synthetic_leads(args.rows_per_shard, 500, seed=i).to_excel(path, index=False, engine='openpyxl')
+            paths.append(path)
+
+        cores = os.cpu_count() or 1
+        print(f"{args.shards} shards x {args.rows_per_shard:,} rows, {cores} core(s)")
+        baseline = None
+        for n in sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1))):
+            start = time.perf_counter()
+            df, moments, _ = read_leads(paths, workers=n)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{n:2d} worker(s): {elapsed:6.2f} s   speed-up x{baseline / elapsed:.2f}")
+        print("merged moments identical to the concatenated table:", moments == numeric_moments(df))
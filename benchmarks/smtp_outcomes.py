@@ -0,0 +1,99 @@
+"""Check the SMTP engine's per-recipient outcomes and delivery log against a local stand-in server.
+
+    python benchmarks/smtp_outcomes.py
+The stand-in server (sink_session from smtp_throughput.py) runs in this process and
+scripts the RCPT reply for some recipients:
+    ok@        accepted                                  -> SENT
+    flaky@     451 once, then accepted                    -> SENT after a retry
+    rejected@  550 (permanent)                            -> FAILED
+    later@     451 on every attempt                       -> DEFERRED
+    bad\\n@     cannot be built (line break in a header)   -> FAILED
+Every message must get its status, appear once in the CSV log written by
+log_results, and reach write_back as sent or failed (deferred ones must not).
+Exit status 1 on any difference.
+"""
+import argparse
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+from multiprocessing import Value
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from smtp_delivery import LOG_COLUMNS, DeliveryEngine, log_results  # noqa: E402
+from smtp_throughput import SENDER, sink_session  # noqa: E402
+
+SEND_DATE = "2025-10-01"
+EXPECTED = {
+    "ok@example.com": "SENT",
+    "flaky@example.com": "SENT",
+    "rejected@example.com": "FAILED",
+    "later@example.com": "DEFERRED",
+    "bad\n@example.com": "FAILED",
+}
+
+
+async def deliver(log_path, retries, connections):
+    delivered = Value("i", 0)
+    rcpt_replies = {
+        "flaky@example.com": [b"451 mailbox busy\r\n"],
+        "rejected@example.com": [b"550 no such user\r\n"],
+        "later@example.com": [b"451 mailbox busy\r\n"] * (retries + 1),
+    }
+    server = await asyncio.start_server(
+        lambda r, w: sink_session(r, w, delivered, 0, 0, rcpt_replies), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    written_back = {"SENT": [], "FAILED": []}
+
+    def write_back(sent_keys, failed_keys):
+        written_back["SENT"].extend(sent_keys)
+        written_back["FAILED"].extend(failed_keys)
+
+    # Keys as message.py builds them: (id, message name, email)
+    messages = [((i, "Promo 1 Date", email), email, "Erbjudande", "Hej!\n.\nHej då")
+                for i, email in enumerate(EXPECTED)]
+    engine = DeliveryEngine("127.0.0.1", port, SENDER, max_connections=connections, retries=retries,
+                            backoff=0.01, result_batch=2)
+    async with server:
+        totals = await engine.deliver(messages, log_results(log_path, SEND_DATE, write_back))
+    return totals, written_back, delivered.value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--connections", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "delivery_log.csv")
+        totals, written_back, delivered = asyncio.run(deliver(log_path, args.retries, args.connections))
+        with open(log_path, newline="", encoding="utf-8") as f:
+            header, *rows = list(csv.reader(f))
+
+    failures = []
+
+    def check(condition, description):
+        print(f"{'ok  ' if condition else 'FAIL'}  {description}")
+        if not condition:
+            failures.append(description)
+
+    logged = {row[2]: row for row in rows}
+    check(header == LOG_COLUMNS, f"log header is {LOG_COLUMNS}")
+    check(len(rows) == len(EXPECTED) and len(logged) == len(EXPECTED), f"one log line per message ({len(rows)})")
+    for email, status in EXPECTED.items():
+        row = logged.get(email)
+        check(row is not None and row[1] == SEND_DATE and row[3] == "Promo 1 Date" and row[4] == status,
+              f"{email!r}: {status} in the log (got {row[4] if row else 'no line'})")
+        in_write_back = [kind for kind, keys in written_back.items() if any(key[2] == email for key in keys)]
+        check(in_write_back == ([] if status == "DEFERRED" else [status]),
+              f"{email!r}: written back as {status if status != 'DEFERRED' else 'nothing'} (got {in_write_back})")
+    counts = {status: list(EXPECTED.values()).count(status) for status in ("SENT", "FAILED", "DEFERRED")}
+    check(totals == counts, f"totals {counts} (got {totals})")
+    check(delivered == counts["SENT"], f"server received {counts['SENT']} messages (got {delivered})")
+    check("gave up after" in logged.get("later@example.com", [""] * 6)[5], "deferred line says how many attempts")
+
+    print(f"\n{len(failures)} failed check(s)" if failures else "\nAll checks passed")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,154 @@
+"""Messages per second delivered by the asyncio SMTP engine against a local stand-in server.
+
+The stand-in server runs in its own process and accepts everything. By default it is a small
+asyncio SMTP sink built from the standard library; with --server aiosmtpd (if installed) it is
+aiosmtpd's Controller instead. --latency-ms delays every server reply to stand in for the round
+trip to a real relay, and --fail-rate answers that share of MAIL commands with a temporary 451
+so the retries are exercised.
+
+First one new connection per message (connect, EHLO, send, QUIT), then the engine with a pool
+of persistent connections of each size.
+
+    python benchmarks/smtp_throughput.py --messages 2000 --latency-ms 2 --connections 1 4 16
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from multiprocessing import Process, Queue, Value
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from smtp_delivery import DeliveryEngine, SMTPConnection, SMTPError, build_message  # noqa: E402
+
+SENDER = "sales@example.com"
+BODY = "Hej [Förnamn],\n\nTack för ditt intresse!\n" * 10
+
+
+async def sink_session(reader, writer, delivered, latency, fail_rate, rcpt_replies=None):
+    """One SMTP session that accepts everything, except for scripted RCPT replies.
+
+    rcpt_replies maps a recipient to the replies for its next RCPT commands, used up in
+    order (then 250); the dict is shared by all sessions.
+    """
+    async def reply(line):
+        if latency:
+            await asyncio.sleep(latency)
+        writer.write(line)
+        await writer.drain()
+
+    await reply(b"220 sink ESMTP\r\n")
+    while line := await reader.readline():
+        command = line[:4].upper()
+        if command in (b"EHLO", b"HELO"):
+            await reply(b"250-sink\r\n250 8BITMIME\r\n")
+        elif command == b"MAIL" and random.random() < fail_rate:
+            await reply(b"451 try again later\r\n")
+        elif command == b"RCPT" and rcpt_replies:
+            recipient = line[line.find(b"<") + 1:line.rfind(b">")].decode("utf-8")
+            scripted = rcpt_replies.get(recipient)
+            await reply(scripted.pop(0) if scripted else b"250 OK\r\n")
+        elif command in (b"MAIL", b"RCPT", b"RSET", b"NOOP"):
+            await reply(b"250 OK\r\n")
+        elif command == b"DATA":
+            await reply(b"354 end with <CRLF>.<CRLF>\r\n")
+            while (data := await reader.readline()) != b".\r\n":
+                if not data:
+                    return
+            with delivered.get_lock():
+                delivered.value += 1
+            await reply(b"250 queued\r\n")
+        elif command == b"QUIT":
+            await reply(b"221 bye\r\n")
+            break
+        else:
+            await reply(b"502 not implemented\r\n")
+    writer.close()
+
+
+def run_sink(ports, delivered, latency, fail_rate):
+    async def serve():
+        server = await asyncio.start_server(
+            lambda r, w: sink_session(r, w, delivered, latency, fail_rate), "127.0.0.1", 0, backlog=512)
+        ports.put(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+    asyncio.run(serve())
+
+
+def run_aiosmtpd(ports, delivered, latency, fail_rate):
+    from aiosmtpd.controller import Controller
+
+    class Handler:
+        async def handle_MAIL(self, server, session, envelope, address, options):
+            if random.random() < fail_rate:
+                return "451 try again later"
+            envelope.mail_from = address
+            return "250 OK"
+
+        async def handle_DATA(self, server, session, envelope):
+            if latency:
+                await asyncio.sleep(latency)
+            with delivered.get_lock():
+                delivered.value += 1
+            return "250 queued"
+
+    controller = Controller(Handler(), hostname="127.0.0.1", port=0)
+    controller.start()
+    ports.put(controller.server.sockets[0].getsockname()[1])
+    while True:
+        time.sleep(3600)
+
+
+async def connection_per_message(port, messages):
+    for _, recipient, subject, body in messages:
+        while True:
+            connection = SMTPConnection("127.0.0.1", port)
+            await connection.connect()
+            try:
+                await connection.send(SENDER, recipient, build_message(SENDER, recipient, subject, body))
+                break
+            except SMTPError as error:
+                if not error.temporary:
+                    raise
+            finally:
+                await connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=None, help="messages/s limit for the engine")
+    parser.add_argument("--server", choices=["sink", "aiosmtpd"], default="sink")
+    args = parser.parse_args()
+
+    ports, delivered = Queue(), Value("i", 0)
+    target = run_aiosmtpd if args.server == "aiosmtpd" else run_sink
+    server = Process(target=target, args=(ports, delivered, args.latency_ms / 1000, args.fail_rate), daemon=True)
+    server.start()
+    port = ports.get(timeout=30)
+
+    messages = [(i, f"lead{i}@example.com", f"Erbjudande {i}", BODY) for i in range(args.messages)]
+    results = []
+
+    # One session per message, capped at 200 messages so the run stays short
+    sample = messages[:min(200, len(messages))]
+    start = time.perf_counter()
+    asyncio.run(connection_per_message(port, sample))
+    baseline = len(sample) / (time.perf_counter() - start)
+    print(f"connection per message: {baseline:8.1f} messages/s   ({len(sample)} messages)")
+
+    for count in args.connections:
+        delivered.value = 0
+        engine = DeliveryEngine("127.0.0.1", port, SENDER, max_connections=count, rate=args.rate,
+                                retries=5, backoff=0.01, result_batch=100)
+        start = time.perf_counter()
+        totals = asyncio.run(engine.deliver(messages, results.extend))
+        rate = args.messages / (time.perf_counter() - start)
+        print(f"{count:3d} pooled connection(s): {rate:8.1f} messages/s   x{rate / baseline:.2f}   "
+              f"{totals}   server received {delivered.value}")
+    server.terminate()
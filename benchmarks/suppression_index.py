@@ -0,0 +1,70 @@
+"""Size and lookup speed of the send-suppression index (Bloom filter + SQLite set).
+
+    python benchmarks/suppression_index.py --entries 1000000
+Reports the insert rate, lookup time for unsent and sent keys, the measured Bloom
+false-positive rate, memory of the filter and size of the files on disk.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from suppression import SuppressionIndex, key_digest, suppression_key  # noqa: E402
+
+KINDS = [("promotion", n) for n in range(1, 8)] + [("educational", ""), ("feedback", ""), ("welcome", "")]
+
+
+def keys(start, count):
+    for i in range(start, start + count):
+        kind, promo = KINDS[i % len(KINDS)]
+        yield suppression_key(f"lead{i // len(KINDS)}@example.com", kind, promo, f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sent_messages.sqlite")
+        index = SuppressionIndex(path, capacity=args.entries)
+
+        start = time.perf_counter()
+        batch = []
+        for key in keys(0, args.entries):
+            batch.append(key)
+            if len(batch) == 100_000:
+                index.add_many(batch)
+                batch = []
+        index.add_many(batch)
+        insert_time = time.perf_counter() - start
+        index.close()
+
+        start = time.perf_counter()
+        index = SuppressionIndex(path, capacity=args.entries)
+        open_time = time.perf_counter() - start
+
+        unsent = list(keys(args.entries, args.lookups))
+        start = time.perf_counter()
+        found = sum(key in index for key in unsent)
+        unsent_time = time.perf_counter() - start
+        false_positives = sum(key_digest(key) in index.bloom for key in unsent)
+
+        sent = list(keys(0, args.lookups))
+        start = time.perf_counter()
+        hits = sum(key in index for key in sent)
+        sent_time = time.perf_counter() - start
+
+        disk = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+        print(f"{args.entries:,} sent messages")
+        print(f"insert           {args.entries / insert_time:10,.0f} keys/s")
+        print(f"reopen           {open_time * 1000:10.1f} ms (filter loaded from disk)")
+        print(f"lookup, unsent   {unsent_time / args.lookups * 1e6:10.2f} us   ({found} reported sent)")
+        print(f"lookup, sent     {sent_time / args.lookups * 1e6:10.2f} us   ({hits:,} of {args.lookups:,} found)")
+        print(f"false positives  {false_positives / args.lookups:10.2%} of unsent keys reach SQLite")
+        print(f"filter memory    {len(index.bloom.bits) / 1e6:10.1f} MB")
+        print(f"on disk          {disk / 1e6:10.1f} MB   ({disk / args.entries:.0f} bytes per sent message)")
+        index.close()
@@ -0,0 +1,104 @@
+"""Follow-up dates as a cadence per lead instead of ten materialized date columns.
+
+Step 9 of analyze_data.py gives every date column a fixed offset from the lead's last
+contact, depending only on its follow-up tier:
+    Promo k Date    = Last Contact Date + promo_offset + promo_step * (k - 1)   (k = 1..7)
+    Education Date  = Last Contact Date + education
+    Feedback Date   = Last Contact Date + feedback
+    Welcome Date    = Scored Date + 1 (last purchase 1 day ago) or Scored Date (2 days ago)
+So the scored table only needs 'Follow-up Tier', 'Last Contact Date' and 'Scored Date'.
+date_view() rebuilds the classic columns when they are wanted, and due_on() answers
+"which messages are due on this date" with a few array operations over the whole table.
+"""
+import numpy as np
+import pandas as pd
+
+from scoring import FOLLOW_UP_TIERS
+
+TIER_COLUMN = "Follow-up Tier"
+ANCHOR_COLUMN = "Last Contact Date"
+SCORED_COLUMN = "Scored Date"
+PROMO_COLUMNS = [f"Promo {k} Date" for k in range(1, 8)]
+DATE_COLUMNS = ["Education Date", "Feedback Date", "Welcome Date"] + PROMO_COLUMNS
+
+# One row per FOLLOW_UP_TIERS entry (Lead Score >= 0.8, 0.7, 0.6, 0.4, below); -1 = no such message
+CADENCES = pd.DataFrame({
+    'follow_up':    [days for _, days in FOLLOW_UP_TIERS],
+    'promo_offset': [5, 7, 10, -1, -1],
+    'promo_step':   [5, 7, 30, -1, -1],
+    'education':    [10, 14, 20, 15, 30],
+    'feedback':     [30, 28, 30, 30, -1],
+})
+
+
+def is_cadence_table(df):
+    return TIER_COLUMN in df.columns
+
+
+def assign_cadence(tier, today, rng=None):
+    """Random last contact within each lead's follow-up interval (as in Step 9).
+
+    `tier` indexes FOLLOW_UP_TIERS (see scoring.follow_up_tier). Returns the tiers as int8 and the dates.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    tier = np.asarray(tier).astype(np.int8)
+    days_ago = rng.integers(1, CADENCES['follow_up'].to_numpy()[tier] + 1)
+    anchor = np.datetime64(today, 'D') - days_ago.astype('timedelta64[D]')
+    return tier, anchor
+
+
+def _days(values):
+    return pd.to_datetime(values).to_numpy().astype('datetime64[D]')
+
+
+def _params(df):
+    tier = df[TIER_COLUMN].to_numpy().astype(np.intp)
+    return {name: CADENCES[name].to_numpy()[tier] for name in CADENCES.columns}
+
+
+def date_view(df):
+    """The classic date columns (NaT where a tier has no such message), computed on demand."""
+    anchor, scored = _days(df[ANCHOR_COLUMN]), _days(df[SCORED_COLUMN])
+    params = _params(df)
+    recency = df['Time Since Last Purchase'].to_numpy()
+
+    def offset(days, base=anchor):
+        return np.where(days >= 0, base + days.astype('timedelta64[D]'), np.datetime64('NaT'))
+
+    view = {
+        'Next Follow-up Date': offset(params['follow_up']),
+        'Education Date': offset(params['education']),
+        'Feedback Date': offset(params['feedback']),
+        'Welcome Date': offset(np.select([recency == 1, recency == 2], [1, 0], default=-1), scored),
+    }
+    for k, col in enumerate(PROMO_COLUMNS):
+        has_promo = params['promo_offset'] >= 0
+        view[col] = offset(np.where(has_promo, params['promo_offset'] + params['promo_step'] * k, -1))
+    return pd.DataFrame(view, index=df.index)
+
+
+def due_on(df, date):
+    """Boolean table (rows x DATE_COLUMNS): which messages fall on `date`.
+
+    O(1) arithmetic per lead: the number of days since the last contact decides
+    education/feedback, and which promo k (if any) lands on the date.
+    """
+    params = _params(df)
+    date = np.datetime64(date, 'D')
+    days = (date - _days(df[ANCHOR_COLUMN])).astype(np.int64)
+    since_scored = (date - _days(df[SCORED_COLUMN])).astype(np.int64)
+    recency = df['Time Since Last Purchase'].to_numpy()
+
+    step = np.maximum(params['promo_step'], 1)
+    k = (days - params['promo_offset']) // step
+    promo_due = ((params['promo_offset'] >= 0) & (days >= params['promo_offset'])
+                 & ((days - params['promo_offset']) % step == 0) & (k < len(PROMO_COLUMNS)))
+
+    due = {
+        'Education Date': days == params['education'],
+        'Feedback Date': (params['feedback'] >= 0) & (days == params['feedback']),
+        'Welcome Date': ((recency == 1) & (since_scored == 1)) | ((recency == 2) & (since_scored == 0)),
+    }
+    for i, col in enumerate(PROMO_COLUMNS):
+        due[col] = promo_due & (k == i)
+    return pd.DataFrame(due, index=df.index)[DATE_COLUMNS]
@@ -0,0 +1,285 @@
+"""Merge duplicate leads that share the same (normalized) email address.
+
+Duplicates are collapsed into one lead per email:
+- Previous Purchases are summed
+- Time Since Last Purchase keeps the most recent purchase (the smallest value)
+- Average Purchase Value (SEK) becomes the purchase-weighted average
+- Date Added keeps the earliest date
+- every other column keeps the value from the first occurrence
+
+The merged leads stay in the order in which each email first appeared.
+
+Run directly to deduplicate a file that is larger than memory:
+    python dedup.py demo_leads.xlsx demo_leads_dedup.xlsx --partitions 16
+"""
+import argparse
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+EMAIL_COLUMN = "Email"
+PURCHASES_COLUMN = "Previous Purchases"
+RECENCY_COLUMN = "Time Since Last Purchase"
+VALUE_COLUMN = "Average Purchase Value (SEK)"
+DATE_ADDED_COLUMN = "Date Added"
+
+ROW_ID = "__row_id"
+MERGE_CHUNK_ROWS = 1_000  # rows per pickled chunk of a deduplicated partition
+
+
+def normalize_emails(emails):
+    """Return emails in NFC, stripped and lower-cased (missing values stay missing)."""
+    emails = pd.Series(emails, copy=False).astype("string")
+    emails = emails.str.normalize("NFC").str.strip().str.lower()
+    return emails.mask(emails == "")
+
+
+def email_codes(emails):
+    """Map every row to a lead id using a hash index on the normalized email.
+
+    Rows without an email never match anything, so each of them gets its own id.
+    """
+    codes, uniques = pd.factorize(normalize_emails(emails))
+    missing = codes == -1
+    codes[missing] = len(uniques) + np.arange(missing.sum())
+    return codes
+
+
+def deduplicate_leads(df):
+    """Merge leads with the same normalized email.
+
+    Runs in linear time (hash grouping, no sorting).
+    Returns the deduplicated DataFrame and a report with one row per merged email.
+    """
+    codes = email_codes(df[EMAIL_COLUMN])
+    rows_per_lead = np.bincount(codes)
+    report_columns = [EMAIL_COLUMN, "Rows Merged"]
+
+    if len(rows_per_lead) == len(df):
+        return df.reset_index(drop=True), pd.DataFrame(columns=report_columns)
+
+    # One row per lead: the whole first row (not the first non-null value of each column).
+    # First positions come from a scatter-min and a boolean mask, so nothing is sorted.
+    first = np.full(len(rows_per_lead), len(df))
+    np.minimum.at(first, codes, np.arange(len(df)))
+    is_first = np.zeros(len(df), dtype=bool)
+    is_first[first] = True
+    first_rows = np.flatnonzero(is_first)  # leads in order of first appearance
+    lead_codes = codes[first_rows]
+
+    # Renumber the leads 0, 1, 2, ... in that order, so grouping without sorting lines up with `merged`
+    renumber = np.empty(len(rows_per_lead), dtype=np.intp)
+    renumber[lead_codes] = np.arange(len(lead_codes))
+    codes = renumber[codes]
+    merged = df.iloc[first_rows].reset_index(drop=True)
+    duplicated = rows_per_lead[lead_codes] > 1
+
+    def per_lead(values, how):
+        """Aggregate per lead id, aligned with `merged`; min_count=1 keeps all-missing groups missing."""
+        grouped = values.groupby(codes, sort=False)
+        result = grouped.sum(min_count=1) if how == "sum" else getattr(grouped, how)()
+        return result.to_numpy()
+
+    def set_duplicates(column, values):
+        # Leads without duplicates keep their row exactly as it was
+        if pd.api.types.is_integer_dtype(df[column].dtype):
+            values = np.round(values).astype(df[column].dtype)
+        merged.loc[duplicated, column] = values[duplicated]
+
+    if PURCHASES_COLUMN in df.columns:
+        purchases = df[PURCHASES_COLUMN]
+        set_duplicates(PURCHASES_COLUMN, per_lead(purchases, "sum"))
+
+        if VALUE_COLUMN in df.columns:
+            # Weight only by the purchases of rows that have a value
+            value = df[VALUE_COLUMN]
+            weight = purchases.fillna(0).where(value.notna(), 0)
+            spend = per_lead(weight * value.fillna(0), "sum")
+            weights = per_lead(weight, "sum")
+            with np.errstate(invalid="ignore", divide="ignore"):
+                weighted = np.where(weights > 0, spend / np.where(weights > 0, weights, 1), np.nan)
+            fallback = per_lead(value, "mean")  # NaN when no row of the lead has a value
+            set_duplicates(VALUE_COLUMN, np.where(np.isnan(weighted), fallback, weighted))
+
+    if RECENCY_COLUMN in df.columns:
+        set_duplicates(RECENCY_COLUMN, per_lead(df[RECENCY_COLUMN], "min"))
+
+    if DATE_ADDED_COLUMN in df.columns:
+        set_duplicates(DATE_ADDED_COLUMN, per_lead(df[DATE_ADDED_COLUMN], "min"))
+
+    report = pd.DataFrame({
+        EMAIL_COLUMN: normalize_emails(merged.loc[duplicated, EMAIL_COLUMN]).to_numpy(),
+        "Rows Merged": rows_per_lead[lead_codes][duplicated],
+    }, columns=report_columns)
+
+    return merged, report
+
+
+# -----------------------------
+# Out-of-core mode: hash partitioning on disk
+# -----------------------------
+def read_chunks(path, chunksize, columns=None):
+    """Yield the rows of an .xlsx or .csv file as DataFrames of at most `chunksize` rows.
+
+    With `columns`, only those of them that exist in the file are kept.
+    """
+    if path.lower().endswith(".csv"):
+        usecols = (lambda name: name in columns) if columns is not None else None
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=usecols)
+        return
+
+    wb = load_workbook(path, read_only=True)
+    rows = wb.active.iter_rows(values_only=True)
+    header = next(rows)
+    keep = None if columns is None else [i for i, name in enumerate(header) if name in columns]
+    if keep is not None:
+        header = [header[i] for i in keep]
+    chunk = []
+    for row in rows:
+        chunk.append(row if keep is None else [row[i] for i in keep])
+        if len(chunk) == chunksize:
+            yield pd.DataFrame(chunk, columns=header)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk, columns=header)
+    wb.close()
+
+
+def _partition_rows(path, tmp_dir, partitions, chunksize):
+    """Append every chunk's rows to the partition file chosen by hashing the email."""
+    files = [open(os.path.join(tmp_dir, f"part-{i}.pkl"), "wb") for i in range(partitions)]
+    columns, offset = None, 0
+    try:
+        for chunk in read_chunks(path, chunksize):
+            columns = list(chunk.columns)
+            chunk[ROW_ID] = np.arange(offset, offset + len(chunk))
+            offset += len(chunk)
+
+            keys = normalize_emails(chunk[EMAIL_COLUMN])
+            # Stable hash so the same email always lands in the same partition
+            part = pd.util.hash_pandas_object(keys, index=False).to_numpy() % partitions
+            for i, piece in chunk.groupby(part, sort=False):
+                pickle.dump(piece, files[i])
+    finally:
+        for f in files:
+            f.close()
+    return columns, offset
+
+
+def _load_partition(file_name):
+    pieces = []
+    with open(file_name, "rb") as f:
+        while True:
+            try:
+                pieces.append(pickle.load(f))
+            except EOFError:
+                break
+    return pd.concat(pieces, ignore_index=True) if pieces else None
+
+
+def _dedup_partition(file_name, columns):
+    """Deduplicate one partition in memory and store its rows sorted by first occurrence.
+
+    The rows are written as a sequence of small pickled chunks, so the final merge
+    can read them back a chunk at a time.
+    """
+    part = _load_partition(file_name)
+    if part is None:
+        open(file_name, "wb").close()
+        return pd.DataFrame(columns=[EMAIL_COLUMN, "Rows Merged"])
+
+    # Sort by original position so "first occurrence" matches the in-memory mode
+    part = part.sort_values(ROW_ID, kind="stable")
+    merged, report = deduplicate_leads(part)
+
+    with open(file_name, "wb") as f:
+        for start in range(0, len(merged), MERGE_CHUNK_ROWS):
+            chunk = merged.iloc[start:start + MERGE_CHUNK_ROWS]
+            values = chunk[columns].astype(object).where(chunk[columns].notna(), None)
+            pickle.dump(list(zip(chunk[ROW_ID].tolist(), values.itertuples(index=False, name=None))), f)
+    return report
+
+
+def _iter_partition(file_name):
+    """Yield a deduplicated partition's rows, loading one chunk at a time."""
+    with open(file_name, "rb") as f:
+        while True:
+            try:
+                chunk = pickle.load(f)
+            except EOFError:
+                return
+            yield from chunk
+
+
+def deduplicate_file(input_path, output_path, partitions=16, chunksize=100_000, tmp_dir=None):
+    """Deduplicate a lead file that does not fit in memory.
+
+    Rows are streamed chunk by chunk and hash-partitioned on disk by normalized email,
+    so all duplicates of a lead end up in the same partition. Each partition is then
+    merged in memory, and the partitions are streamed back in original order, holding
+    one chunk of MERGE_CHUNK_ROWS rows per partition at a time.
+    Memory use is bounded by the size of the largest partition.
+    Returns the report of merged emails and the number of rows read.
+    """
+    work_dir = tempfile.mkdtemp(prefix="dedup-", dir=tmp_dir)
+    try:
+        columns, total_rows = _partition_rows(input_path, work_dir, partitions, chunksize)
+        part_files = [os.path.join(work_dir, f"part-{i}.pkl") for i in range(partitions)]
+        reports = [_dedup_partition(f, columns) for f in part_files]
+
+        rows = heapq.merge(*(_iter_partition(f) for f in part_files), key=lambda r: r[0])
+        if output_path.lower().endswith(".csv"):
+            pd.DataFrame(columns=columns).to_csv(output_path, index=False)
+            batch = []
+            for _, values in rows:
+                batch.append(values)
+                if len(batch) == chunksize:
+                    pd.DataFrame(batch, columns=columns).to_csv(output_path, mode="a", header=False, index=False)
+                    batch = []
+            pd.DataFrame(batch, columns=columns).to_csv(output_path, mode="a", header=False, index=False)
+        else:
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet()
+            ws.append(columns)
+            for _, values in rows:
+                ws.append(values)
+            wb.save(output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    reports = [r for r in reports if not r.empty]
+    if not reports:
+        return pd.DataFrame(columns=[EMAIL_COLUMN, "Rows Merged"]), total_rows
+    return pd.concat(reports, ignore_index=True), total_rows
+
+
+def print_report(report, total_rows):
+    if report.empty:
+        print(f"No duplicate leads found in {total_rows} rows.")
+        return
+    collapsed = int(report["Rows Merged"].sum()) - len(report)
+    print(f"Merged {collapsed} duplicate rows into {len(report)} leads "
+          f"({total_rows} rows -> {total_rows - collapsed} leads).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge duplicate leads by email.")
+    parser.add_argument("input", help="lead file (.xlsx or .csv)")
+    parser.add_argument("output", help="deduplicated file (.xlsx or .csv)")
+    parser.add_argument("--partitions", type=int, default=16,
+                        help="number of on-disk hash partitions (more partitions = less memory)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="rows read per chunk")
+    parser.add_argument("--report", default="duplicate_leads_report.xlsx",
+                        help="where to save the list of merged emails")
+    args = parser.parse_args()
+
+    report, total_rows = deduplicate_file(args.input, args.output, args.partitions, args.chunksize)
+    print_report(report, total_rows)
+    if not report.empty:
+        report.to_excel(args.report, index=False, engine='openpyxl')
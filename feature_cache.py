@@ -0,0 +1,95 @@
+"""On-disk cache of the scaled feature matrix, keyed by a hash of the source data.
+
+analyze_data.py stores, per input file and feature setting:
+    leads.pkl          parsed and deduplicated leads (so reruns skip the Excel parse)
+    X.npy              dense scaled features, or
+    X_data.npy, X_indices.npy, X_indptr.npy   the sparse CSR matrix
+    ltv.npy            historical LTV (Previous Purchases x Average Purchase Value)
+    recency.npy        Time Since Last Purchase (to rebuild the purchase target)
+    preprocessor.joblib
+The arrays are plain .npy files opened with mmap_mode='r', so reruns and worker
+processes map them zero-copy and share the same pages through the OS cache.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+CACHE_DIR = ".feature_cache"
+CACHE_VERSION = 2
+
+
+def source_key(paths, *settings):
+    """Hash of the file contents (one path or a list of shards) plus the feature settings."""
+    digest = hashlib.sha256()
+    for path in [paths] if isinstance(paths, str) else paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    digest.update(json.dumps([CACHE_VERSION, *settings]).encode("utf-8"))
+    return digest.hexdigest()[:20]
+
+
+def save_features(key, leads, X, ltv, recency, preprocessor, cache_dir=CACHE_DIR):
+    """Write one cache entry atomically (a half-written entry is never visible)."""
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f"{key}-", dir=cache_dir)
+    try:
+        if sparse.issparse(X):
+            X = sparse.csr_matrix(X)
+            np.save(os.path.join(tmp, "X_data.npy"), X.data)
+            np.save(os.path.join(tmp, "X_indices.npy"), X.indices)
+            np.save(os.path.join(tmp, "X_indptr.npy"), X.indptr)
+        else:
+            np.save(os.path.join(tmp, "X.npy"), np.asarray(X))
+        np.save(os.path.join(tmp, "ltv.npy"), np.asarray(ltv, dtype=np.float64))
+        np.save(os.path.join(tmp, "recency.npy"), np.asarray(recency, dtype=np.float64))
+        leads.to_pickle(os.path.join(tmp, "leads.pkl"))
+        joblib.dump(preprocessor, os.path.join(tmp, "preprocessor.joblib"))
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"shape": list(X.shape), "sparse": sparse.issparse(X)}, f)
+
+        target = os.path.join(cache_dir, key)
+        if os.path.exists(target):
+            shutil.rmtree(tmp)  # another process already wrote the same entry
+        else:
+            os.rename(tmp, target)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_arrays(key, cache_dir=CACHE_DIR):
+    """Map the cached feature matrix, LTV and recency without copying. Returns None if missing."""
+    path = os.path.join(cache_dir, key)
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+
+    def mapped(name):
+        return np.load(os.path.join(path, name), mmap_mode="r")
+
+    if meta["sparse"]:
+        X = sparse.csr_matrix((mapped("X_data.npy"), mapped("X_indices.npy"), mapped("X_indptr.npy")),
+                              shape=tuple(meta["shape"]), copy=False)
+    else:
+        X = mapped("X.npy")
+    return {"X": X, "ltv": mapped("ltv.npy"), "recency": mapped("recency.npy")}
+
+
+def load_features(key, cache_dir=CACHE_DIR):
+    """Cached arrays plus the parsed leads and fitted preprocessor. Returns None if missing."""
+    cached = load_arrays(key, cache_dir)
+    if cached is None:
+        return None
+    path = os.path.join(cache_dir, key)
+    cached["leads"] = pd.read_pickle(os.path.join(path, "leads.pkl"))
+    cached["preprocessor"] = joblib.load(os.path.join(path, "preprocessor.joblib"))
+    return cached
@@ -1,9 +1,36 @@
 import pandas as pd
 from datetime import datetime
+import asyncio
+import getpass
 import os
+import socket
 import unicodedata
 import pyperclip
 from openpyxl import load_workbook
+from cadence import due_on, is_cadence_table
+from send_queue import SendQueue, replace_workbook
+from smtp_delivery import DeliveryEngine, log_results
+from suppression import SuppressionIndex, suppression_key
+
+# --- Settings ---
+USE_WORK_QUEUE = False            # True = share the day's messages with other operators (leased batches)
+QUEUE_FILE = "send_queue.sqlite"  # the queue file every operator on this machine points at
+QUEUE_BATCH_SIZE = 25             # messages per batch
+LEASE_MINUTES = 15                # a batch with no confirmed send for this long goes back to the queue
+OPERATOR = f"{getpass.getuser()}@{socket.gethostname()}:{os.getpid()}"
+SUPPRESSION_FILE = "sent_messages.sqlite"  # every sent message, kept across rescoring (never re-sent)
+DELIVERY = "clipboard"            # "smtp" = send the day's rendered messages automatically over SMTP
+SMTP_HOST = "localhost"
+SMTP_PORT = 587
+SMTP_STARTTLS = True              # upgrade the connection with STARTTLS (port 587)
+SMTP_USERNAME = os.environ.get("SMTP_USERNAME")  # no login when unset
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD")
+SMTP_FROM = "sales@example.com"
+SMTP_CONNECTIONS = 4              # persistent connections, i.e. messages in flight at once
+SMTP_RATE = 10                    # messages per second at most (None = no limit)
+SMTP_RETRIES = 3                  # retries with backoff for temporary failures (4xx, dropped connections)
+SMTP_RESULT_BATCH = 100           # results written back to the lead store per batch
+DELIVERY_LOG = "delivery_log.csv" # one line per SMTP message: sent, failed (rejected) or deferred
 
 # --- Ask user for date input ---
 while True:
@@ -17,6 +44,7 @@ while True:
 # Load the Excel file with pandas for data access
 file_path = "demo_leads_scored.xlsx"
 df = pd.read_excel(file_path)
+cadence_table = is_cadence_table(df)  # scored with DATE_LAYOUT = "cadence"
 
 # Columns to check
 date_columns = [
@@ -64,131 +92,291 @@ def replace_placeholders(text, first_name):
         normalized = normalized.replace(ph, first_name)
     return normalized
 
-# Pre-scan to count total matches
-total_matches = 0
-for _, row in df.iterrows():
-    for col in date_columns:
-        cell = row.get(col)
-        if pd.isna(cell) or str(cell).strip().upper() == "N/A":
-            continue
-        try:
-            cell_date = pd.to_datetime(cell).date() if not isinstance(cell, pd.Timestamp) else cell.date()
-        except:
-            continue
-        if cell_date == selected_date:
-            total_matches += 1
-            break
+def matches_date(cell):
+    """True if a date cell holds the selected date ("N/A", "DONE" and blanks never match)."""
+    if pd.isna(cell) or str(cell).strip().upper() == "N/A":
+        return False
+    try:
+        cell_date = pd.to_datetime(cell).date() if not isinstance(cell, pd.Timestamp) else cell.date()
+    except:
+        return False
+    return cell_date == selected_date
 
-print(f"\n🔎 Total people with a date matching {selected_date}: {total_matches}\n")
 
-# Load the workbook for single-cell updates
-wb = load_workbook(file_path)
-ws = wb.active  # Assuming the first sheet is the correct one
+def due_flags(df):
+    """Boolean table (rows x date columns) of the messages that fall on the selected date."""
+    if cadence_table:
+        return due_on(df, selected_date)  # computed from tier + last contact, no date columns stored
+    return pd.DataFrame({col: df[col].map(matches_date) if col in df.columns else False
+                         for col in date_columns}, index=df.index)
 
-# Iterate through each row
-for row_index, row in df.iterrows():
-    matched_columns = []
 
-    for col in date_columns:
-        cell = row.get(col)
-        if pd.isna(cell) or str(cell).strip().upper() == "N/A":
-            continue
-        try:
-            cell_date = pd.to_datetime(cell).date() if not isinstance(cell, pd.Timestamp) else cell.date()
-        except:
-            continue
-        if cell_date == selected_date:
-            matched_columns.append(col)
+def message_key(email, match_col):
+    """Suppression key: (Email, message kind, promo number, date)."""
+    promo_number = match_col.split()[1] if "Promo" in match_col else ""
+    return suppression_key(email, column_folder_map.get(match_col, ""), promo_number, selected_date)
 
-    if matched_columns:
-        language = row.get("Swedish/English", "No Preference Provided")
-        email = row.get("Email", "No Email Provided")
-        first_name = row.get("First Name", "")
-        industry_raw = row.get("Industry", "")
 
-        # Normalize industry name to NFC
-        industry = unicodedata.normalize("NFC", str(industry_raw))
+def render_message(row, match_col):
+    """Subject and body of the message for one date column, or None if no template is found."""
+    language = row.get("Swedish/English", "No Preference Provided")
+    first_name = row.get("First Name", "")
+    industry_raw = row.get("Industry", "")
 
-        print(f"📧 Email: {email}")
+    # Normalize industry name to NFC
+    industry = unicodedata.normalize("NFC", str(industry_raw))
 
-        # Determine language folder
-        if language.lower().startswith("english"):
-            language_folder = "English"
-        elif language.lower().startswith("swedish") or language.lower().startswith("svenska"):
-            language_folder = "Svenska"
-        else:
-            language_folder = ""
+    # Determine language folder
+    if language.lower().startswith("english"):
+        language_folder = "English"
+    elif language.lower().startswith("swedish") or language.lower().startswith("svenska"):
+        language_folder = "Svenska"
+    else:
+        language_folder = ""
 
-        # Determine industry folder
-        industry_folder = industry_folder_map.get(industry, "")
+    # Determine industry folder
+    industry_folder = industry_folder_map.get(industry, "")
 
-        for match_col in matched_columns:
-            folder_type = column_folder_map.get(match_col, "")
-            folder_path = os.path.join(base_folder, language_folder, folder_type, industry_folder)
+    folder_type = column_folder_map.get(match_col, "")
+    folder_path = os.path.join(base_folder, language_folder, folder_type, industry_folder)
 
-            if not os.path.exists(folder_path):
-                print(f"⚠️ Folder not found: {folder_path}")
-                continue
+    if not os.path.exists(folder_path):
+        print(f"⚠️ Folder not found: {folder_path}")
+        return None
+
+    txt_files = [f for f in os.listdir(folder_path) if f.endswith(".txt")]
+    selected_file = None
+
+    if "Promo" in match_col:
+        promo_number = match_col.split()[1]
+        for f in txt_files:
+            if f.startswith(promo_number):
+                selected_file = f
+                break
+    else:
+        if txt_files:
+            selected_file = txt_files[0]
+
+    if not selected_file:
+        print(f"⚠️ No .txt file found in {folder_path} for {match_col}")
+        return None
+
+    # Read and process content
+    file_path_full = os.path.join(folder_path, selected_file)
+    with open(file_path_full, "r", encoding="utf-8") as file:
+        content = file.read()
+
+    content = replace_placeholders(content, first_name)
+
+    # Determine and process subject
+    subject = os.path.splitext(selected_file)[0]
+    subject = replace_placeholders(subject, first_name)
+
+    if "promotion" in folder_path.lower() and subject:
+        subject = subject[1:]
+    return subject, content
+
+
+def send_by_clipboard(email, subject, content):
+    """Show the message, copy email/subject/body to the clipboard and wait for 'yes'."""
+    # Print subject and content
+    print(f"\n📌 Subject: {subject}\n")
+    print(content)
+    print("\n" + "-" * 50 + "\n")
+
+    # Clipboard workflow: email → subject → body
+    pyperclip.copy(email)
+    input("📋 Email copied to clipboard. Press Enter to copy subject...")
+    pyperclip.copy(subject)
+    input("📋 Subject copied to clipboard. Press Enter to copy email body...")
+    pyperclip.copy(content)
+    input("📋 Email body copied to clipboard. Press Enter when ready to confirm sending...")
+
+    # Prompt until user types "yes"
+    while input("Type 'yes' to confirm you've sent the email: ").strip().lower() != "yes":
+        pass
+
+
+def deliver_by_smtp(messages, write_back):
+    """Send [(key, email, subject, content), ...] over SMTP.
+
+    Results arrive in batches: every batch is appended to DELIVERY_LOG and then recorded
+    in the lead store with write_back(sent_keys, failed_keys). Failed means rejected for
+    good (e.g. unknown address); deferred messages (only temporary errors) are left as
+    they are, so they are due again on the next run. Returns the count per status.
+    """
+    engine = DeliveryEngine(SMTP_HOST, SMTP_PORT, SMTP_FROM, max_connections=SMTP_CONNECTIONS,
+                            rate=SMTP_RATE, retries=SMTP_RETRIES, result_batch=SMTP_RESULT_BATCH,
+                            starttls=SMTP_STARTTLS, username=SMTP_USERNAME, password=SMTP_PASSWORD)
+    log_and_write_back = log_results(DELIVERY_LOG, selected_date, write_back)
 
-            txt_files = [f for f in os.listdir(folder_path) if f.endswith(".txt")]
-            selected_file = None
+    def write_results(results):
+        log_and_write_back(results)
+        for key, status, detail in results:
+            if status != "SENT":
+                print(f"❌ {key[1]} to {key[2]} {status.lower()}: {detail}")
 
-            if "Promo" in match_col:
-                promo_number = match_col.split()[1]
-                for f in txt_files:
-                    if f.startswith(promo_number):
-                        selected_file = f
-                        break
+    totals = asyncio.run(engine.deliver(messages, write_results))
+    print(f"📤 SMTP: {totals['SENT']} sent, {totals['FAILED']} failed, {totals['DEFERRED']} deferred "
+          f"(see {DELIVERY_LOG}).")
+    return totals
+
+
+# Pre-scan to find all matches, leaving out messages that were already sent (even before a rescore)
+sent = SuppressionIndex(SUPPRESSION_FILE)
+flags = due_flags(df)
+due, already_sent = [], 0
+for row_index in flags.index[flags.any(axis=1)]:
+    row = df.loc[row_index]
+    columns = [col for col in date_columns if flags.at[row_index, col]]
+    unsent = [col for col in columns if message_key(row.get("Email"), col) not in sent]
+    already_sent += len(columns) - len(unsent)
+    if unsent:
+        due.append((row_index, row, unsent))
+total_matches = len(due)
+
+print(f"\n🔎 Total people with a date matching {selected_date}: {total_matches}\n")
+if already_sent:
+    print(f"⏭️ Skipping {already_sent} messages already sent for {selected_date} ({SUPPRESSION_FILE}).\n")
+
+if USE_WORK_QUEUE:
+    # --- Work-queue mode: operators claim leased batches and merge DONE statuses at the end ---
+    queue = SendQueue(QUEUE_FILE, lease_seconds=LEASE_MINUTES * 60)
+    added = queue.enqueue(selected_date, [(row_index, col, row.get("Email"))
+                                          for row_index, row, columns in due for col in columns],
+                          QUEUE_BATCH_SIZE)
+    print(f"🗂️ Queued {added} messages for {selected_date}." if added else
+          f"🗂️ Joining the queue for {selected_date} ({queue.progress(selected_date)}).")
+
+    while (claimed := queue.claim(selected_date, OPERATOR)) is not None:
+        batch_id, messages = claimed
+        print(f"📦 Claimed batch {batch_id} ({len(messages)} messages) as {OPERATOR}\n")
+        sent.refresh()  # see messages other operators have sent since this one started
+        if DELIVERY == "smtp":
+            rendered, unsendable = [], []
+            for message_id, row_index, match_col, email in messages:
+                if message_key(email, match_col) in sent:
+                    queue.ack(batch_id, message_id, OPERATOR)  # sent in an earlier run
+                    continue
+                if not isinstance(email, str) or not email.strip():
+                    print(f"⚠️ No email address for row {row_index + 2}, skipping {match_col}.")
+                    unsendable.append(message_id)
+                    continue
+                email = email.strip()
+                message = render_message(df.loc[row_index], match_col)
+                if message is None:
+                    unsendable.append(message_id)
+                else:
+                    rendered.append(((message_id, match_col, email), email, *message))
+            queue.skip(unsendable)  # otherwise the batch would never be finished
+
+            def record_batch(sent_keys, failed_keys):
+                sent.add_many([message_key(email, match_col) for _, match_col, email in sent_keys])
+                queue.ack_many(batch_id, [message_id for message_id, _, _ in sent_keys], OPERATOR)
+                queue.skip([message_id for message_id, _, _ in failed_keys], status="FAILED")
+
+            if deliver_by_smtp(rendered, record_batch)["DEFERRED"] == 0:
+                queue.finish(batch_id, OPERATOR)
+            # otherwise the batch stays leased: its deferred messages are retried once the lease runs out
+            continue
+        for message_id, row_index, match_col, email in messages:
+            if not queue.is_pending(message_id):
+                continue  # sent by someone who picked up this batch after our lease ran out
+            if message_key(email, match_col) in sent:
+                queue.ack(batch_id, message_id, OPERATOR)  # sent in an earlier run
+                continue
+            row = df.loc[row_index]
+            print(f"📧 Email: {email}")
+            message = render_message(row, match_col)
+            if message is None:
+                queue.skip([message_id])  # otherwise the batch would be handed out again and again
+                continue
+            send_by_clipboard(email, *message)
+            sent.add(message_key(email, match_col))
+            if queue.ack(batch_id, message_id, OPERATOR):
+                print(f"✅ Recorded {match_col} as sent for {email}\n")
             else:
-                if txt_files:
-                    selected_file = txt_files[0]
+                print(f"⚠️ Lease on batch {batch_id} expired; recorded {email}, leaving the rest to its new owner.\n")
+                break
+        queue.finish(batch_id, OPERATOR)
 
-            if not selected_file:
-                print(f"⚠️ No .txt file found in {folder_path} for {match_col}")
+    if cadence_table:
+        print(f"✅ Nothing left to claim for {selected_date}. Sent messages are recorded in {SUPPRESSION_FILE}.")
+    else:
+        merged = queue.merge_done(file_path)
+        print(f"✅ Nothing left to claim for {selected_date}. Wrote {merged} status cells to {file_path}.")
+    queue.close()
+elif DELIVERY == "smtp":
+    # --- SMTP mode: render every due message, send them all, save the results once at the end ---
+    wb = None if cadence_table else load_workbook(file_path)
+    headers = {} if wb is None else {cell.value: cell.column for cell in wb.active[1]}
+    rendered = []
+    for row_index, row, columns in due:
+        email = row.get("Email")
+        if not isinstance(email, str) or not email.strip():
+            print(f"⚠️ No email address for row {row_index + 2}, skipping {', '.join(columns)}.")
+            continue
+        email = email.strip()
+        for match_col in columns:
+            message = render_message(row, match_col)
+            if message is not None:
+                rendered.append(((row_index, match_col, email), email, *message))
+
+    status_cells = 0
+
+    def record_results(sent_keys, failed_keys):
+        # Runs on the event loop: only in-memory updates here, the workbook is saved after delivery
+        global status_cells
+        sent.add_many([message_key(email, match_col) for _, match_col, email in sent_keys])
+        if wb is None:
+            return  # cadence layout: the suppression index and DELIVERY_LOG are the record
+        for status, keys in (("DONE", sent_keys), ("FAILED", failed_keys)):
+            for row_index, match_col, _ in keys:
+                if match_col in headers:
+                    wb.active.cell(row=row_index + 2, column=headers[match_col], value=status)
+                    status_cells += 1
+
+    print(f"📤 Sending {len(rendered)} messages via {SMTP_HOST}:{SMTP_PORT} "
+          f"({SMTP_CONNECTIONS} connections, {SMTP_RATE or 'no'} messages/s limit)\n")
+    try:
+        deliver_by_smtp(rendered, record_results)
+    finally:
+        # Also after an interruption: every result collected so far is kept (the file is replaced atomically)
+        if status_cells:
+            replace_workbook(wb, file_path)
+            print(f"✅ Wrote {status_cells} status cells to {file_path}.")
+else:
+    # Load the workbook for single-cell updates
+    wb = load_workbook(file_path)
+    ws = wb.active  # Assuming the first sheet is the correct one
+
+    # Iterate through each matching row
+    for row_index, row, columns in due:
+        email = row.get("Email", "No Email Provided")
+        print(f"📧 Email: {email}")
+
+        for match_col in columns:
+            message = render_message(row, match_col)
+            if message is None:
+                continue
+            send_by_clipboard(email, *message)
+            sent.add(message_key(email, match_col))
+            if cadence_table:
+                print(f"✅ Recorded {match_col} as sent for {email}\n")  # no date cell to mark
                 continue
 
-            # Read and process content
-            file_path_full = os.path.join(folder_path, selected_file)
-            with open(file_path_full, "r", encoding="utf-8") as file:
-                content = file.read()
-
-            content = replace_placeholders(content, first_name)
-
-            # Determine and process subject
-            subject = os.path.splitext(selected_file)[0]
-            subject = replace_placeholders(subject, first_name)
-
-            if "promotion" in folder_path.lower() and subject:
-                subject = subject[1:]
-
-            # Print subject and content
-            print(f"\n📌 Subject: {subject}\n")
-            print(content)
-            print("\n" + "-" * 50 + "\n")
-
-            # Clipboard workflow: email → subject → body
-            pyperclip.copy(email)
-            input("📋 Email copied to clipboard. Press Enter to copy subject...")
-            pyperclip.copy(subject)
-            input("📋 Subject copied to clipboard. Press Enter to copy email body...")
-            pyperclip.copy(content)
-            input("📋 Email body copied to clipboard. Press Enter when ready to confirm sending...")
-
-            # Prompt until user types "yes"
-            while True:
-                user_input = input("Type 'yes' to confirm you've sent the email: ").strip().lower()
-                if user_input == "yes":
-                    # Find the column number in Excel
-                    col_number = None
-                    for idx, header in enumerate(ws[1], start=1):
-                        if header.value == match_col:
-                            col_number = idx
-                            break
-                    if col_number is not None:
-                        excel_row = row_index + 2  # Adjust for header row
-                        ws.cell(row=excel_row, column=col_number, value="DONE")
-                        wb.save(file_path)
-                        print(f"✅ Updated cell {match_col} to 'DONE' for {email}\n")
-                    else:
-                        print(f"⚠️ Could not find column {match_col} in Excel to update.")
+            # Find the column number in Excel
+            col_number = None
+            for idx, header in enumerate(ws[1], start=1):
+                if header.value == match_col:
+                    col_number = idx
                     break
+            if col_number is not None:
+                excel_row = row_index + 2  # Adjust for header row
+                ws.cell(row=excel_row, column=col_number, value="DONE")
+                wb.save(file_path)
+                print(f"✅ Updated cell {match_col} to 'DONE' for {email}\n")
+            else:
+                print(f"⚠️ Could not find column {match_col} in Excel to update.")
+
+sent.close()
@@ -1,197 +1,492 @@
-import pandas as pd
+import hashlib
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
 from fpdf import FPDF, XPos, YPos
-from datetime import datetime
+from PIL import Image
 
-# -----------------------------
-# Step 1: Read Excel file
-# -----------------------------
-file_name = "demo_leads_scored.xlsx"
-df = pd.read_excel(file_name)
+from approximate import (STRATA_COLUMNS, estimate_means, estimate_percentages, reservoir_sample,
+                         stratified_sample)
+from dedup import read_chunks
+from shards import map_shards, resolve_shards
 
 # -----------------------------
-# Step 2: Filter Lead Score between 0 and 1
+# Settings
 # -----------------------------
-df = df[(df['Lead Score'] >= 0) & (df['Lead Score'] <= 1)]
+file_name = "demo_leads_scored.xlsx"   # or a glob / manifest of shards, e.g. "scored/*.xlsx"
+SHARD_WORKERS = None          # processes aggregating input shards (None = all cores)
+BATCH_SEGMENT_COLUMN = None   # e.g. "Industry", "City" or "Lead Source": one report per segment
+BATCH_OUTPUT_DIR = "reports"
+BATCH_WORKERS = None          # worker processes for batch mode (None = all cores)
+CHART_DIR = "report_charts"   # charts are stored by content, so identical charts are drawn once
+TABLE_TOP_N = 15              # larger group tables (e.g. City) show only the top and bottom N
+TABLE_COLUMNS = 3             # columns used for those tables
+APPROXIMATE = None            # None = exact; "stratified" or "reservoir" = estimates from a sample with 95% CIs
+SAMPLE_SIZE = 50_000          # rows sampled in approximate mode
 
-# -----------------------------
-# Step 3: Define bins for each tenth
-# -----------------------------
 bins = [i/10 for i in range(11)]
 labels = [f"{bins[i]:.1f}-{bins[i+1]:.1f}" for i in range(len(bins)-1)]
-
-# -----------------------------
-# Step 4: Calculate percentages
-# -----------------------------
-df['Score Range'] = pd.cut(df['Lead Score'], bins=bins, labels=labels, include_lowest=True)
-percentages = df['Score Range'].value_counts(normalize=True).sort_index() * 100
-
-# -----------------------------
-# Step 5: Create pie chart of score ranges
-# -----------------------------
 colors = ['#4E79A7', '#F28E2B', '#E15759', '#76B7B2', '#59A14F',
           '#EDC948', '#B07AA1', '#FF9DA7', '#9C755F', '#BAB0AC']
+GROUP_COLUMNS = ['Industry', 'City', 'Lead Source']
+REPORT_COLUMNS = ['Lead Score', 'Previous Purchases', 'Average Purchase Value (SEK)'] + GROUP_COLUMNS
 
-plt.figure(figsize=(6, 6))
-plt.pie(
-    percentages,
-    labels=labels,
-    autopct='%1.1f%%',
-    startangle=90,
-    colors=colors,
-    wedgeprops={'edgecolor': 'white'}
-)
-plt.title("Percentage of leads by score range")
-score_chart_file = "lead_score_pie_chart.png"
-plt.savefig(score_chart_file, bbox_inches='tight')
-plt.close()
 
 # -----------------------------
-# Step 6: Calculate averages
+# Step 1-4: Read and prepare the data
 # -----------------------------
-industry_avg = df.groupby('Industry')['Lead Score'].mean().sort_values(ascending=False) if 'Industry' in df.columns else pd.Series(dtype=float)
-city_avg = df.groupby('City')['Lead Score'].mean().sort_values(ascending=False) if 'City' in df.columns else pd.Series(dtype=float)
-source_avg = df.groupby('Lead Source')['Lead Score'].mean().sort_values(ascending=False) if 'Lead Source' in df.columns else pd.Series(dtype=float)
+def load_leads(file_name):
+    return prepare_leads(pd.read_excel(file_name))
+
+
+def in_score_range(df):
+    """Leads with a Lead Score between 0 and 1."""
+    return df[(df['Lead Score'] >= 0) & (df['Lead Score'] <= 1)]
+
+
+def prepare_leads(df):
+    # Filter Lead Score between 0 and 1
+    df = in_score_range(df).copy()
+
+    # Bin each tenth of Lead Score, and Revenue per customer
+    df['Score Range'] = pd.cut(df['Lead Score'], bins=bins, labels=labels, include_lowest=True)
+    if 'Previous Purchases' in df.columns and 'Average Purchase Value (SEK)' in df.columns:
+        df['Revenue'] = df['Previous Purchases'] * df['Average Purchase Value (SEK)']
+    return df
+
 
 # -----------------------------
-# Step 7: Calculate Revenue
+# Step 5-7: Calculate percentages, averages and revenue
 # -----------------------------
-if 'Previous Purchases' in df.columns and 'Average Purchase Value (SEK)' in df.columns:
-    df['Revenue'] = df['Previous Purchases'] * df['Average Purchase Value (SEK)']
-    revenue_by_industry = df.groupby('Industry')['Revenue'].mean().sort_values(ascending=False) if 'Industry' in df.columns else pd.Series(dtype=float)
-    revenue_by_city = df.groupby('City')['Revenue'].mean().sort_values(ascending=False) if 'City' in df.columns else pd.Series(dtype=float)
-    revenue_by_source = df.groupby('Lead Source')['Revenue'].mean().sort_values(ascending=False) if 'Lead Source' in df.columns else pd.Series(dtype=float)
-else:
-    revenue_by_industry = pd.Series(dtype=float)
-    revenue_by_city = pd.Series(dtype=float)
-    revenue_by_source = pd.Series(dtype=float)
+def sorted_means(stats):
+    """Mean per group from a (sum, count) table, highest first."""
+    if stats is None or stats.empty:
+        return pd.Series(dtype=float)
+    return (stats['sum'] / stats['count']).sort_values(ascending=False)
+
+
+def compute_aggregates(df):
+    """Score-range percentages and Lead Score / Revenue sums and counts per group for one table."""
+    return split_segments(df, None)[None]
+
+
+def split_segments(df, segment_column):
+    """Aggregates for every segment of `segment_column` (or the whole table for None)."""
+    return finish_aggregates(segment_partials(df, segment_column), segment_column)
+
+
+def segment_partials(df, segment_column):
+    """Score Range counts and Lead Score / Revenue (sum, count) tables for one table or shard.
+
+    Each statistic is one grouped pass over the table for all segments at once
+    (sums and counts), instead of filtering and re-aggregating per segment.
+    They are additive, so the partials of several shards can be merged exactly.
+    """
+    keys = [segment_column] if segment_column else []
+    if segment_column:
+        df = df[df[segment_column].notna()]
+
+    def grouped(value_column, group_column):
+        if value_column not in df.columns or group_column not in df.columns:
+            return None
+        return df.groupby(keys + [group_column], observed=True)[value_column].agg(['sum', 'count'])
+
+    return {
+        'range_counts': df.groupby(keys + ['Score Range'], observed=False).size(),
+        'lead_score': {col: grouped('Lead Score', col) for col in GROUP_COLUMNS},
+        'revenue': {col: grouped('Revenue', col) for col in GROUP_COLUMNS},
+    }
+
+
+def merge_partials(parts):
+    """Reduce: add up the partials of several shards (groups missing from a shard count as 0)."""
+    def add(tables):
+        tables = [table for table in tables if table is not None]
+        if len(tables) <= 1:
+            return tables[0] if tables else None
+        levels = list(range(tables[0].index.nlevels))
+        return pd.concat(tables).groupby(level=levels, observed=True).sum()
+
+    return {
+        'range_counts': add([part['range_counts'] for part in parts]),
+        'lead_score': {col: add([part['lead_score'][col] for part in parts]) for col in GROUP_COLUMNS},
+        'revenue': {col: add([part['revenue'][col] for part in parts]) for col in GROUP_COLUMNS},
+    }
+
+
+def finish_aggregates(partials, segment_column):
+    """Percentages and per-group tables for every segment from (merged) partials."""
+    def by_segment(table):
+        if table is None:
+            return {}
+        if not segment_column:
+            return {None: table}
+        return {segment: part.droplevel(0) for segment, part in table.groupby(level=0, observed=True)}
+
+    range_counts = by_segment(partials['range_counts'])
+    score_stats = {col: by_segment(partials['lead_score'][col]) for col in GROUP_COLUMNS}
+    revenue_stats = {col: by_segment(partials['revenue'][col]) for col in GROUP_COLUMNS}
+
+    result = {}
+    for segment in sorted(range_counts) if segment_column else [None]:
+        counts = range_counts[segment]
+        result[segment] = {
+            'percentages': counts / counts.sum() * 100,
+            'leads': int(counts.sum()),
+            'lead_score': {col: score_stats[col].get(segment) for col in GROUP_COLUMNS},
+            'revenue': {col: revenue_stats[col].get(segment) for col in GROUP_COLUMNS},
+        }
+    return result
+
+
+def _shard_partials(file_name, segment_column):
+    """Map: partials of one shard, computed in a worker process."""
+    return segment_partials(load_leads(file_name), segment_column)
+
+
+def aggregate_shards(file_names, segment_column=None, workers=None):
+    """Map-reduce over input shards: per-shard partials in parallel, then merged.
+
+    Only the small partial tables travel between processes, never the leads.
+    Returns {segment: aggregates} like split_segments (segment None without a segment column).
+    """
+    parts = map_shards(partial(_shard_partials, segment_column=segment_column), file_names, workers)
+    return finish_aggregates(merge_partials(parts), segment_column)
+
+
+def read_report_columns(path):
+    """Only the columns the report uses, streamed from an .xlsx or .csv shard."""
+    return pd.concat(read_chunks(path, 100_000, REPORT_COLUMNS), ignore_index=True)
+
+
+def sample_leads(df, size, seed=None):
+    """Stratified sample of raw leads; only the sampled rows are binned and get Revenue."""
+    score = df['Lead Score']
+    return stratified_sample(df, size, seed=seed, prepare=prepare_leads, where=(score >= 0) & (score <= 1))
+
+
+def approximate_aggregates(sample, method):
+    """Same aggregates as compute_aggregates, estimated from a weighted sample, plus 95% CIs."""
+    percentages, percentages_ci = estimate_percentages(sample, 'Score Range', labels)
+    population = int(sample.attrs['population'].sum())
+
+    def estimates(value_column, group_column):
+        if value_column not in sample.columns or group_column not in sample.columns:
+            return None
+        return estimate_means(sample, value_column, group_column)[['sum', 'count', 'ci']]
+
+    return {
+        'percentages': percentages,
+        'percentages_ci': percentages_ci,
+        'leads': population,
+        'lead_score': {col: estimates('Lead Score', col) for col in GROUP_COLUMNS},
+        'revenue': {col: estimates('Revenue', col) for col in GROUP_COLUMNS},
+        'approximate': (f"APPROXIMATE REPORT: estimated from a {method} sample of {len(sample):,} "
+                        f"of {population:,} leads"
+                        + (f" (strata: {' x '.join(STRATA_COLUMNS)})" if method == "stratified" else "")
+                        + ". Values in parentheses are 95% confidence intervals."),
+    }
+
 
 # -----------------------------
-# Step 8: Create charts for Lead Source
+# Step 5 and 8: Create charts
 # -----------------------------
-if not source_avg.empty:
-    plt.figure(figsize=(6, 4))
-    source_avg.plot(kind='bar', color='#4E79A7')
-    plt.ylabel("Average Lead Score")
-    plt.title("Average Lead Score by Lead Source")
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    leadscore_chart_file = "leadscore_by_source_bar.png"
-    plt.savefig(leadscore_chart_file)
-    plt.close()
+def _chart_file(kind, data):
+    """Content-addressed chart file: the same data always maps to the same image."""
+    digest = hashlib.sha1(f"{kind}|{data.to_json()}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CHART_DIR, f"{kind}-{digest}.png")
 
-if not revenue_by_source.empty:
-    plt.figure(figsize=(6, 6))
-    plt.pie(
-        revenue_by_source,
-        labels=revenue_by_source.index,
-        autopct='%1.1f%%',
-        startangle=90,
-        wedgeprops={'edgecolor': 'white'}
-    )
-    plt.title("Average Revenue per Customer by Lead Source")
-    revenue_chart_file = "revenue_by_source_pie.png"
-    plt.savefig(revenue_chart_file, bbox_inches='tight')
+
+def _save_chart(path):
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format='png', bbox_inches='tight')
     plt.close()
+    # Saved as RGB: fpdf embeds PNGs without an alpha channel much faster
+    # Written to a temporary name first so parallel workers never read a half-written image
+    tmp = f"{path}.{os.getpid()}.tmp.png"
+    Image.open(buffer).convert('RGB').save(tmp)
+    os.replace(tmp, path)
+
+
+def render_charts(aggregates):
+    """Draw the report's charts, reusing any chart whose data has been drawn before."""
+    os.makedirs(CHART_DIR, exist_ok=True)
+    charts = {}
+
+    percentages = aggregates['percentages']
+    charts['score'] = _chart_file("score-pie", percentages)
+    if not os.path.exists(charts['score']):
+        plt.figure(figsize=(6, 6))
+        plt.pie(
+            percentages,
+            labels=labels,
+            autopct='%1.1f%%',
+            startangle=90,
+            colors=colors,
+            wedgeprops={'edgecolor': 'white'}
+        )
+        plt.title("Percentage of leads by score range")
+        _save_chart(charts['score'])
+
+    source_avg = sorted_means(aggregates['lead_score']['Lead Source'])
+    if not source_avg.empty:
+        charts['leadscore'] = _chart_file("leadscore-by-source", source_avg)
+        if not os.path.exists(charts['leadscore']):
+            plt.figure(figsize=(6, 4))
+            source_avg.plot(kind='bar', color='#4E79A7')
+            plt.ylabel("Average Lead Score")
+            plt.title("Average Lead Score by Lead Source")
+            plt.xticks(rotation=45, ha='right')
+            plt.tight_layout()
+            _save_chart(charts['leadscore'])
+
+    revenue_by_source = sorted_means(aggregates['revenue']['Lead Source'])
+    if not revenue_by_source.empty:
+        charts['revenue'] = _chart_file("revenue-by-source", revenue_by_source)
+        if not os.path.exists(charts['revenue']):
+            plt.figure(figsize=(6, 6))
+            plt.pie(
+                revenue_by_source,
+                labels=revenue_by_source.index,
+                autopct='%1.1f%%',
+                startangle=90,
+                wedgeprops={'edgecolor': 'white'}
+            )
+            plt.title("Average Revenue per Customer by Lead Source")
+            _save_chart(charts['revenue'])
+    return charts
+
 
 # -----------------------------
 # Step 9: Create PDF
 # -----------------------------
-today = datetime.today().strftime("%d %B %Y")
-pdf_file_name = f"{today} Report.pdf"
-
-pdf = FPDF()
-pdf.add_page()
-
-# Title
-pdf.set_font("Helvetica", "B", 16)
-pdf.cell(0, 10, f"{today} Report", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
-
-# Pie chart: Score ranges
-pdf.image(score_chart_file, x=30, w=150)
-
-# Explanatory text (replace en dash with normal hyphen to avoid Unicode issues)
-explanatory_text = (
-    "Lead Score is a 0-1 metric that ranks existing customers by future revenue potential, "
-    "dynamically combining their likelihood of buying again (Purchase Score) and their historical "
-    "spending level (Lifetime Value) to help prioritize retention, reactivation, and upselling efforts."
-)
-pdf.ln(8)
-pdf.set_font("Helvetica", "", 11)
-pdf.multi_cell(0, 6, explanatory_text)
-
-# Percentages
-pdf.ln(4)
-pdf.set_font("Helvetica", "B", 12)
-pdf.cell(0, 8, "Percentage of Leads by Score Range:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-pdf.set_font("Helvetica", "", 12)
-for label, pct in percentages.items():
-    pdf.cell(0, 6, f"{label}: {pct:.1f}%", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-# Average Lead Score by Industry
-if not industry_avg.empty:
-    pdf.ln(2)
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "Average Lead Score by Industry:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-    pdf.set_font("Helvetica", "", 12)
-    for industry, avg_score in industry_avg.items():
-        pdf.cell(0, 6, f"{industry}: {avg_score:.2f}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+def top_bottom(stats, n):
+    """Rows to show for a group table, highest mean first.
 
-# Average Revenue Per Customer by Industry
-if not revenue_by_industry.empty:
-    pdf.ln(2)
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "Average Revenue Per Customer by Industry:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-    pdf.set_font("Helvetica", "", 12)
-    for industry, revenue in revenue_by_industry.items():
-        pdf.cell(0, 6, f"{industry}: {int(round(revenue)):,} SEK", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    With at most 2n groups every group is returned. Otherwise only the top n and
+    bottom n groups are picked by partial selection (argpartition, O(groups)), and
+    everything in between is collapsed into one "Other" row with its overall mean.
+    Returns (names, means, number of groups in "Other").
+    """
+    if len(stats) <= 2 * n:
+        means = sorted_means(stats)
+        return list(means.index), list(means.to_numpy()), 0
 
-# Average Lead Score by City
-if not city_avg.empty:
-    pdf.ln(2)
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "Average Lead Score by City:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-    pdf.set_font("Helvetica", "", 12)
-    for city, avg_score in city_avg.items():
-        pdf.cell(0, 6, f"{city}: {avg_score:.2f}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    sums, counts = stats['sum'].to_numpy(), stats['count'].to_numpy()
+    means = sums / counts
+    names = stats.index.to_numpy()
 
-# Average Revenue Per Customer by City
-if not revenue_by_city.empty:
-    pdf.ln(2)
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "Average Revenue Per Customer by City:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-    pdf.set_font("Helvetica", "", 12)
-    for city, revenue in revenue_by_city.items():
-        pdf.cell(0, 6, f"{city}: {int(round(revenue)):,} SEK", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    top = np.argpartition(-means, n - 1)[:n]
+    rest = np.ones(len(means), dtype=bool)
+    rest[top] = False
+    remaining = np.flatnonzero(rest)
+    bottom = remaining[np.argpartition(means[remaining], n - 1)[:n]]
+    rest[bottom] = False
+
+    top = top[np.argsort(-means[top], kind='stable')]
+    bottom = bottom[np.argsort(-means[bottom], kind='stable')]
+    other_mean = sums[rest].sum() / counts[rest].sum()
+    return ([*names[top], None, *names[bottom]],
+            [*means[top], other_mean, *means[bottom]],
+            int(rest.sum()))
+
+
+def _fit_text(pdf, text, width):
+    if pdf.get_string_width(text) <= width:
+        return text
+    while text and pdf.get_string_width(text + "...") > width:
+        text = text[:-1]
+    return text + "..."
 
-# Bar chart: Average Lead Score by Lead Source
-if not source_avg.empty:
-    pdf.ln(2)
-    pdf.image(leadscore_chart_file, x=25, w=160)
 
-# Average Lead Score by Lead Source
-if not source_avg.empty:
+def _section(pdf, title, stats, fmt, group_label):
+    """One "Average ... by <group>" section.
+
+    Small tables are listed one group per line. Tables with more than 2 x TABLE_TOP_N
+    groups show only the top and bottom TABLE_TOP_N (plus an "Other" row) in
+    TABLE_COLUMNS columns, so the section size does not grow with the number of groups.
+    """
+    if stats is None or stats.empty:
+        return
+    names, values, other = top_bottom(stats, TABLE_TOP_N)
+
     pdf.ln(2)
     pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "Average Lead Score by Lead Source:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    if other:
+        title = f"{title[:-1]} (top and bottom {TABLE_TOP_N} of {len(stats):,}):"
+    pdf.cell(0, 8, title, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
     pdf.set_font("Helvetica", "", 12)
-    for source, avg_score in source_avg.items():
-        pdf.cell(0, 6, f"{source}: {avg_score:.2f}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
 
-# Pie chart: Average Revenue per Customer by Lead Source
-if not revenue_by_source.empty:
-    pdf.ln(2)
-    pdf.image(revenue_chart_file, x=30, w=150)
+    lines = [f"{name if name is not None else f'Other ({other:,} {group_label})'}: {fmt(value)}"
+             for name, value in zip(names, values)]
+    if 'ci' in stats.columns:
+        # Approximate mode: add the 95% confidence interval (not available for the "Other" row)
+        def interval(ci):
+            return "too few sampled" if pd.isna(ci) else f"+/- {fmt(ci)}"
+        lines = [line if name is None else f"{line} ({interval(stats['ci'][name])})"
+                 for line, name in zip(lines, names)]
+    if not other:
+        for line in lines:
+            pdf.cell(0, 6, line, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        return
 
-# Average Revenue Per Customer by Lead Source
-if not revenue_by_source.empty:
-    pdf.ln(2)
+    # Multi-column table, filled column by column; fpdf breaks the page between rows
+    pdf.set_font("Helvetica", "", 10)
+    column_width = pdf.epw / TABLE_COLUMNS
+    rows = -(-len(lines) // TABLE_COLUMNS)
+    for row in range(rows):
+        for column in range(TABLE_COLUMNS):
+            index = column * rows + row
+            text = _fit_text(pdf, lines[index], column_width - 2) if index < len(lines) else ""
+            pdf.cell(column_width, 5, text, new_x=XPos.RIGHT, new_y=YPos.TOP)
+        pdf.ln(5)
+
+
+def build_pdf(aggregates, charts, title, pdf_file_name):
+    def score(value):
+        return f"{value:.2f}"
+
+    def sek(value):
+        return f"{int(round(value)):,} SEK"
+
+    pdf = FPDF()
+    pdf.add_page()
+
+    # Title
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, title, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
+
+    # Approximate mode: say so before anything else
+    if 'approximate' in aggregates:
+        pdf.set_font("Helvetica", "B", 11)
+        pdf.set_text_color(200, 30, 30)
+        pdf.multi_cell(0, 6, aggregates['approximate'], border=1)
+        pdf.set_text_color(0, 0, 0)
+        pdf.ln(2)
+
+    # Pie chart: Score ranges
+    pdf.image(charts['score'], x=30, w=150)
+
+    # Explanatory text (replace en dash with normal hyphen to avoid Unicode issues)
+    explanatory_text = (
+        "Lead Score is a 0-1 metric that ranks existing customers by future revenue potential, "
+        "dynamically combining their likelihood of buying again (Purchase Score) and their historical "
+        "spending level (Lifetime Value) to help prioritize retention, reactivation, and upselling efforts."
+    )
+    pdf.ln(8)
+    pdf.set_font("Helvetica", "", 11)
+    pdf.multi_cell(0, 6, explanatory_text)
+
+    # Percentages
+    pdf.ln(4)
     pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "Average Revenue Per Customer by Lead Source:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.cell(0, 8, "Percentage of Leads by Score Range:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
     pdf.set_font("Helvetica", "", 12)
-    for source, revenue in revenue_by_source.items():
-        pdf.cell(0, 6, f"{source}: {int(round(revenue)):,} SEK", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    for label, pct in aggregates['percentages'].items():
+        text = f"{label}: {pct:.1f}%"
+        if 'percentages_ci' in aggregates:
+            text += f" (+/- {aggregates['percentages_ci'][label]:.1f}%)"
+        pdf.cell(0, 6, text, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    lead_score, revenue = aggregates['lead_score'], aggregates['revenue']
+    _section(pdf, "Average Lead Score by Industry:", lead_score['Industry'], score, "industries")
+    _section(pdf, "Average Revenue Per Customer by Industry:", revenue['Industry'], sek, "industries")
+    _section(pdf, "Average Lead Score by City:", lead_score['City'], score, "cities")
+    _section(pdf, "Average Revenue Per Customer by City:", revenue['City'], sek, "cities")
+
+    # Bar chart: Average Lead Score by Lead Source
+    if 'leadscore' in charts:
+        pdf.ln(2)
+        pdf.image(charts['leadscore'], x=25, w=160)
+    _section(pdf, "Average Lead Score by Lead Source:", lead_score['Lead Source'], score, "sources")
+
+    # Pie chart: Average Revenue per Customer by Lead Source
+    if 'revenue' in charts:
+        pdf.ln(2)
+        pdf.image(charts['revenue'], x=30, w=150)
+    _section(pdf, "Average Revenue Per Customer by Lead Source:", revenue['Lead Source'], sek, "sources")
+
+    # Save PDF
+    pdf.output(pdf_file_name)
+
+
+# -----------------------------
+# Batch mode: one report per segment
+# -----------------------------
+def _safe_file_name(value):
+    return re.sub(r'[\\/:*?"<>|]+', '-', str(value)).strip() or "Unknown"
+
+
+def _render_segments(jobs):
+    """Worker task: render a group of segment reports (charts + PDF) in one process."""
+    for aggregates, title, pdf_file_name in jobs:
+        build_pdf(aggregates, render_charts(aggregates), title, pdf_file_name)
+    return len(jobs)
+
+
+def build_segment_reports(segments, today, output_dir=BATCH_OUTPUT_DIR, workers=None):
+    """Render one PDF per segment value in parallel worker processes.
+
+    `segments` maps each segment value to its aggregates (see aggregate_shards); workers get
+    groups of segments so each process sets up matplotlib/fpdf once for many reports.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(aggregates, f"{today} Report - {segment}",
+             os.path.join(output_dir, f"{today} {_safe_file_name(segment)} Report.pdf"))
+            for segment, aggregates in segments.items()]
+
+    workers = workers or os.cpu_count() or 1
+    group_size = max(1, min(32, len(jobs) // (workers * 4) or 1))
+    groups = [jobs[i:i + group_size] for i in range(0, len(jobs), group_size)]
+    if workers == 1:
+        done = sum(_render_segments(group) for group in groups)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            done = sum(pool.map(_render_segments, groups))
+    return done
+
+
+def main():
+    today = datetime.today().strftime("%d %B %Y")
+    shard_files = resolve_shards(file_name)
+
+    if APPROXIMATE:
+        if APPROXIMATE == "reservoir":
+            # Stream the file(s); only the sample is kept in memory
+            chunks = (prepare_leads(chunk) for path in shard_files
+                      for chunk in read_chunks(path, 100_000, REPORT_COLUMNS))
+            sample = reservoir_sample(chunks, SAMPLE_SIZE)
+        else:
+            # Every row is still read (only the report's columns are kept); after that only the sample is touched
+            df = pd.concat(map_shards(read_report_columns, shard_files, SHARD_WORKERS), ignore_index=True)
+            sample = sample_leads(df, SAMPLE_SIZE)
+        pdf_file_name = f"{today} Approximate Report.pdf"
+        aggregates = approximate_aggregates(sample, APPROXIMATE)
+        build_pdf(aggregates, render_charts(aggregates), f"{today} Report (Approximate)", pdf_file_name)
+        print(f"Approximate report saved as '{pdf_file_name}'")
+        return
+
+    # Sums and counts per shard (in parallel when there are several shards), then merged
+    segments = aggregate_shards(shard_files, BATCH_SEGMENT_COLUMN, SHARD_WORKERS)
+    if BATCH_SEGMENT_COLUMN:
+        count = build_segment_reports(segments, today, BATCH_OUTPUT_DIR, BATCH_WORKERS)
+        print(f"Saved {count} reports by {BATCH_SEGMENT_COLUMN} in '{BATCH_OUTPUT_DIR}'")
+        return
+
+    pdf_file_name = f"{today} Report.pdf"
+    aggregates = segments[None]
+    build_pdf(aggregates, render_charts(aggregates), f"{today} Report", pdf_file_name)
+    print(f"Report saved as '{pdf_file_name}'")
+
 
-# Save PDF
-pdf.output(pdf_file_name)
-print(f"Report saved as '{pdf_file_name}'")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Mergeable quantile sketch (KLL) for streaming and sharded LTV statistics.
+
+A KLL sketch keeps a small number of "compactor" levels. Items at level h stand for
+2**h original values; when a level is full it is sorted and every other item
+(random offset) is promoted to the next level. Sketches built on separate chunks or
+shards can be merged, and the result has the same accuracy as one built on all data.
+
+Error bound: a quantile returned by the sketch has a rank within about +-epsilon * n
+of the requested rank, with epsilon ~= 1.65% for k=200 (99% confidence, as published
+for KLL). Doubling k roughly halves epsilon. Min, max and count are always exact.
+Memory is O(k) items regardless of n.
+"""
+import math
+
+import numpy as np
+
+DEFAULT_K = 200
+
+
+def rank_error(k=DEFAULT_K):
+    """Approximate normalized rank error (99% confidence) for a sketch of size k."""
+    return 1.65 * DEFAULT_K / (100 * k)
+
+
+class KLLSketch:
+    """Streaming, mergeable quantile sketch."""
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        # Adding a level lowers the capacity of the levels below it, so repeat until all fit
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            # Keep one item behind if the count is odd so the total weight is preserved
+            keep = items[-1:] if len(items) % 2 else items[:0]
+            pairs = items[:len(items) - len(keep)]
+            promoted = pairs[self._rng.integers(2)::2]
+            self.levels[level] = keep
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level = 0
+
+    def update(self, values):
+        """Add a chunk of values (array-like); missing values are ignored."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Merge another sketch (built on a different chunk or shard) into this one."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        """Return the values at the given quantiles (0-1)."""
+        if self.n == 0:
+            return np.full(len(qs), np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_), 2.0 ** level)
+                                  for level, items_ in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+        targets = np.asarray(qs, dtype=np.float64) * cumulative[-1]
+        idx = np.minimum(np.searchsorted(cumulative, targets, side="left"), len(items) - 1)
+        result = items[idx]
+        # The extremes are tracked exactly
+        result = np.where(np.asarray(qs) <= 0, self.min, result)
+        return np.where(np.asarray(qs) >= 1, self.max, result)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def rank_error(self):
+        return rank_error(self.k)
+
+    def __len__(self):
+        return self.n
@@ -0,0 +1,222 @@
+"""Feature pipeline and model for the Purchase Score.
+
+Columns are selected by name. Numeric purchase history is standardized and the
+categorical columns (Industry, City, Lead Source) are one-hot encoded into a sparse
+CSR matrix, so a City column with thousands of levels stays cheap to store and fit.
+
+Lifetime Value is normalized with the min, max and median of historical LTV
+(Previous Purchases x Average Purchase Value). The median can come from the exact
+column or from a mergeable quantile sketch built chunk by chunk.
+
+Both scores are rounded to two decimals, so the Lead Score (and its follow-up tier)
+only ever takes 101 x 101 input pairs; those are precomputed once per weighting and
+batches are scored with a table lookup.
+"""
+from functools import lru_cache
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from quantile_sketch import KLLSketch
+
+NUMERIC_FEATURES = ['Previous Purchases', 'Time Since Last Purchase', 'Average Purchase Value (SEK)']
+CATEGORICAL_FEATURES = ['Industry', 'City', 'Lead Source']
+
+# A lead "is likely to buy" if the last purchase was less than this many days ago
+PURCHASE_TARGET_DAYS = 200
+
+# Share of the score gap that is moved to the higher of Purchase Score and LTV
+WEIGHT_ADJUSTMENT = 0.3
+
+# Follow-up tiers: (lowest Lead Score in the tier, days between follow-ups)
+FOLLOW_UP_TIERS = [(0.8, 5), (0.7, 7), (0.6, 10), (0.4, 15), (0.0, 30)]
+
+
+def feature_frame(df, categorical=True):
+    """Select the model's input columns by name."""
+    columns = NUMERIC_FEATURES + (CATEGORICAL_FEATURES if categorical else [])
+    X = df[columns].copy()
+    for col in CATEGORICAL_FEATURES if categorical else []:
+        X[col] = X[col].fillna('Unknown').astype(str)
+    return X
+
+
+def purchase_target(df, days=PURCHASE_TARGET_DAYS):
+    """Binary target: 1 if the last purchase was less than `days` days ago."""
+    return (df['Time Since Last Purchase'] < days).astype(int)
+
+
+def build_preprocessor(categorical=True):
+    """Scale the numeric columns and, optionally, one-hot encode the categorical ones.
+
+    With categorical features the output is always a sparse CSR matrix.
+    """
+    transformers = [('numeric', StandardScaler(), NUMERIC_FEATURES)]
+    if not categorical:
+        return ColumnTransformer(transformers)
+    transformers.append(('categorical',
+                         OneHotEncoder(handle_unknown='ignore', sparse_output=True, dtype=np.float64),
+                         CATEGORICAL_FEATURES))
+    return ColumnTransformer(transformers, sparse_threshold=1.0)
+
+
+def build_classifier(categorical=True):
+    """Logistic regression for the Purchase Score.
+
+    lbfgs only needs sparse matrix-vector products, so it fits the CSR matrix without
+    densifying it. At 1M rows and 5,000 cities it converged in ~20 iterations and was
+    faster than saga and liblinear (see benchmarks/purchase_model_features.py).
+    """
+    if not categorical:
+        return LogisticRegression()
+    return LogisticRegression(solver='lbfgs', max_iter=200)
+
+
+def historical_ltv(df):
+    """Previous Purchases x Average Purchase Value."""
+    return df['Previous Purchases'] * df['Average Purchase Value (SEK)']
+
+
+def ltv_stats_exact(ltv):
+    """Min, max and median of the full LTV column (needs all values in memory)."""
+    ltv = np.asarray(ltv, dtype=np.float64)
+    return float(ltv.min()), float(ltv.max()), float(np.median(ltv))
+
+
+def ltv_sketch(ltv, chunksize=100_000, sketch=None):
+    """Feed LTV values into a quantile sketch chunk by chunk (pass `sketch` to keep adding)."""
+    sketch = sketch if sketch is not None else KLLSketch()
+    ltv = np.asarray(ltv, dtype=np.float64)
+    for start in range(0, len(ltv), chunksize):
+        sketch.update(ltv[start:start + chunksize])
+    return sketch
+
+
+def ltv_stats_sketch(sketch):
+    """Min and max (exact) and median (within the sketch's rank error) from a sketch."""
+    return sketch.min, sketch.max, sketch.median()
+
+
+def normalize_ltv(ltv, ltv_min, ltv_max, ltv_median):
+    """Min-max normalize LTV, then scale so the median lead lands at 0.5 (clipped to 0-1)."""
+    ltv_range = ltv_max - ltv_min
+    normalized = (np.asarray(ltv, dtype=np.float64) - ltv_min) / ltv_range
+    median = (ltv_median - ltv_min) / ltv_range
+    return np.round(np.clip(normalized / (2 * median), 0, 1), 2)
+
+
+def lead_scores(purchase_scores, ltv_normalized, adjustment_weight=WEIGHT_ADJUSTMENT):
+    """Combine Purchase Score and LTV, giving more weight to whichever is higher."""
+    lead_score = []
+    for p_score, ltv_score in zip(purchase_scores, ltv_normalized):
+        diff = abs(p_score - ltv_score)
+        adjustment = adjustment_weight * diff
+        if p_score > ltv_score:
+            weight_p = 0.5 + adjustment
+            weight_ltv = 0.5 - adjustment
+        elif ltv_score > p_score:
+            weight_ltv = 0.5 + adjustment
+            weight_p = 0.5 - adjustment
+        else:
+            weight_p = weight_ltv = 0.5
+        lead_score.append(round(p_score * weight_p + ltv_score * weight_ltv, 2))
+    return np.array(lead_score)
+
+
+def follow_up_tier(lead_score):
+    """Index into FOLLOW_UP_TIERS for each Lead Score (0 = most frequent follow-ups)."""
+    lead_score = np.asarray(lead_score, dtype=np.float64)
+    conditions = [lead_score >= low for low, _ in FOLLOW_UP_TIERS]
+    return np.select(conditions, np.arange(len(FOLLOW_UP_TIERS)), default=len(FOLLOW_UP_TIERS) - 1)
+
+
+def follow_up_days(lead_score):
+    """Days between follow-ups for each Lead Score (same tiers as analyze_data.py Step 9)."""
+    lead_score = np.asarray(lead_score, dtype=np.float64)
+    conditions = [lead_score >= low for low, _ in FOLLOW_UP_TIERS]
+    return np.select(conditions, [days for _, days in FOLLOW_UP_TIERS], default=FOLLOW_UP_TIERS[-1][1])
+
+
+# -----------------------------
+# Quantized Lead Score lookup
+# -----------------------------
+GRID_SIZE = 101  # Purchase Score and Lifetime Value are both rounded to 0.00, 0.01, ..., 1.00
+
+
+def grid_index(values):
+    """Integer grid positions of two-decimal scores, or None if any value is off the grid (or NaN)."""
+    values = np.asarray(values, dtype=np.float64)
+    index = np.rint(values * 100)
+    if not np.all((index >= 0) & (index < GRID_SIZE) & (index / 100 == values)):
+        return None
+    return index.astype(np.intp)
+
+
+@lru_cache(maxsize=None)
+def lead_score_table(adjustment_weight=WEIGHT_ADJUSTMENT):
+    """Lead Score for every (Purchase Score, Lifetime Value) pair on the grid, computed by lead_scores()."""
+    grid = np.arange(GRID_SIZE) / 100
+    purchase, ltv = np.meshgrid(grid, grid, indexing='ij')
+    table = lead_scores(purchase.ravel(), ltv.ravel(), adjustment_weight).reshape(GRID_SIZE, GRID_SIZE)
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=None)
+def follow_up_tier_table(adjustment_weight=WEIGHT_ADJUSTMENT):
+    """Follow-up tier for every (Purchase Score, Lifetime Value) pair on the grid."""
+    table = follow_up_tier(lead_score_table(adjustment_weight)).astype(np.int8)
+    table.flags.writeable = False
+    return table
+
+
+def quantized_lead_scores(purchase_scores, ltv_normalized, adjustment_weight=WEIGHT_ADJUSTMENT):
+    """Same result as lead_scores(), as one table lookup; inputs off the grid use the loop."""
+    p, ltv = grid_index(purchase_scores), grid_index(ltv_normalized)
+    if p is None or ltv is None:
+        return lead_scores(purchase_scores, ltv_normalized, adjustment_weight)
+    return lead_score_table(adjustment_weight)[p, ltv]
+
+
+def quantized_follow_up_tiers(purchase_scores, ltv_normalized, adjustment_weight=WEIGHT_ADJUSTMENT):
+    """Follow-up tier straight from Purchase Score and Lifetime Value, without the Lead Score."""
+    p, ltv = grid_index(purchase_scores), grid_index(ltv_normalized)
+    if p is None or ltv is None:
+        return follow_up_tier(lead_scores(purchase_scores, ltv_normalized, adjustment_weight))
+    return follow_up_tier_table(adjustment_weight)[p, ltv]
+
+
+# -----------------------------
+# Persisted model (used by service.py)
+# -----------------------------
+def save_model(path, preprocessor, model, categorical, ltv_min, ltv_max, ltv_median):
+    """Save everything needed to score new leads without retraining."""
+    joblib.dump({
+        'preprocessor': preprocessor,
+        'model': model,
+        'categorical': categorical,
+        'ltv_min': ltv_min,
+        'ltv_max': ltv_max,
+        'ltv_median': ltv_median,
+    }, path)
+
+
+def load_model(path):
+    return joblib.load(path)
+
+
+def score_leads(bundle, df):
+    """Purchase Score, Lifetime Value, Lead Score and follow-up tier for new leads with a saved model."""
+    X = feature_frame(df, categorical=bundle['categorical'])
+    purchase = np.round(bundle['model'].predict_proba(bundle['preprocessor'].transform(X))[:, 1], 2)
+    ltv = normalize_ltv(historical_ltv(df), bundle['ltv_min'], bundle['ltv_max'], bundle['ltv_median'])
+    return pd.DataFrame({
+        'Purchase Score': purchase,
+        'Lifetime Value': ltv,
+        'Lead Score': quantized_lead_scores(purchase, ltv),
+        'Follow-up Tier': quantized_follow_up_tiers(purchase, ltv),
+    }, index=df.index)
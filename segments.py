@@ -0,0 +1,55 @@
+"""Per-segment Purchase Score models, trained in parallel worker processes.
+
+Leads are partitioned by a column (Industry by default). Each large enough segment
+gets its own scaler/encoder and logistic regression, fitted in a process pool, so a
+segment like Bygg is not forced onto the same coefficients as IT-tjänster. Segments
+that are too small, or that only contain one class of the purchase target, keep the
+global model's scores. Results are put back in the original row order.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scoring import build_classifier, build_preprocessor, feature_frame, purchase_target
+
+MIN_SEGMENT_SIZE = 50
+
+
+def _fit_and_score(X, y, categorical):
+    """Fit a scaler and model on one segment and return its rounded Purchase Scores."""
+    features = build_preprocessor(categorical).fit_transform(X)
+    model = build_classifier(categorical).fit(features, y)
+    return np.round(model.predict_proba(features)[:, 1], 2)
+
+
+def segment_purchase_scores(df, column, global_scores, categorical=True,
+                            min_size=MIN_SEGMENT_SIZE, workers=None):
+    """Purchase Scores from one model per value of `column`.
+
+    `global_scores` (in df row order) are used for segments that cannot get their own model.
+    Returns the scores in df row order and a summary with one row per segment.
+    """
+    X = feature_frame(df, categorical)
+    y = purchase_target(df)
+    scores = np.asarray(global_scores, dtype=np.float64).copy()
+    segment_values = df[column].fillna('Unknown').astype(str).to_numpy()
+
+    jobs, summary = {}, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for segment, positions in pd.Series(np.arange(len(df))).groupby(segment_values, sort=True):
+            positions = positions.to_numpy()
+            y_segment = y.iloc[positions]
+            if len(positions) < min_size:
+                summary.append((segment, len(positions), "global (too small)"))
+            elif y_segment.nunique() < 2:
+                summary.append((segment, len(positions), "global (one class only)"))
+            else:
+                jobs[segment] = (positions, pool.submit(_fit_and_score, X.iloc[positions], y_segment,
+                                                        categorical))
+                summary.append((segment, len(positions), "segment"))
+
+        for segment, (positions, future) in jobs.items():
+            scores[positions] = future.result()
+
+    return scores, pd.DataFrame(summary, columns=[column, 'Leads', 'Model'])
@@ -0,0 +1,244 @@
+"""Shared work queue for sending one day's messages with several operators at once.
+
+The day's due messages (one per lead and date column) are split into batches in a
+SQLite file. Every operator (or worker process) claims a batch, which leases it for
+a while, sends its messages and acknowledges each one. A batch whose lease runs out
+without progress goes back to the queue, so abandoned work is picked up by someone
+else; acknowledged messages are never handed out again.
+
+SQLite's write lock makes claiming a batch atomic across processes. Writing the
+acknowledged messages into the workbook as "DONE" (saved to a temporary file, then
+renamed over it) is serialized by the write lock of a second SQLite file instead, so
+merges never overwrite each other and the queue stays free for claims meanwhile.
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+
+from openpyxl import load_workbook
+
+QUEUE_FILE = "send_queue.sqlite"
+BATCH_SIZE = 25
+LEASE_SECONDS = 15 * 60
+MERGE_TIMEOUT = 10 * 60  # seconds to wait for another operator's merge to finish
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY,
+    send_date TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'OPEN',      -- OPEN, LEASED or DONE
+    operator TEXT,
+    lease_expires REAL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    batch_id INTEGER NOT NULL REFERENCES batches(id),
+    send_date TEXT NOT NULL,
+    row_index INTEGER NOT NULL,               -- position in the workbook (0 = first lead)
+    date_column TEXT NOT NULL,
+    email TEXT,
+    status TEXT NOT NULL DEFAULT 'PENDING',   -- PENDING, DONE, FAILED, MERGED (written to the workbook)
+                                              -- or SKIPPED
+    operator TEXT,
+    done_at REAL,
+    UNIQUE (send_date, row_index, date_column)
+);
+CREATE INDEX IF NOT EXISTS batches_by_date ON batches (send_date, status);
+CREATE INDEX IF NOT EXISTS messages_by_batch ON messages (batch_id, status);
+"""
+
+
+def replace_workbook(wb, workbook_path):
+    """Save a workbook to a temporary file next to it, then rename it over the original.
+
+    A crash while saving leaves the old file intact instead of a half-written one.
+    """
+    folder = os.path.dirname(os.path.abspath(workbook_path))
+    fd, tmp = tempfile.mkstemp(suffix=".xlsx", dir=folder)
+    os.close(fd)
+    try:
+        wb.save(tmp)
+        shutil.copymode(workbook_path, tmp)  # mkstemp creates the file private to this user
+        os.replace(tmp, workbook_path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+class SendQueue:
+    """Leased batches of one day's messages in a SQLite file shared by all operators."""
+
+    def __init__(self, path=QUEUE_FILE, lease_seconds=LEASE_SECONDS):
+        self.lease_seconds = lease_seconds
+        self.merge_lock_path = path + ".merge-lock"
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE takes the write lock up front, so check-then-update is atomic."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    @contextmanager
+    def _merge_lock(self):
+        """Exclusive lock on a separate SQLite file, held for a whole workbook merge."""
+        lock = sqlite3.connect(self.merge_lock_path, timeout=MERGE_TIMEOUT, isolation_level=None)
+        try:
+            lock.execute("BEGIN EXCLUSIVE")
+            yield
+        finally:
+            lock.close()  # rolls back the empty transaction and releases the lock
+
+    def enqueue(self, send_date, messages, batch_size=BATCH_SIZE):
+        """Queue (row_index, date_column, email) messages for a date, unless already queued.
+
+        The first operator to start the day creates the batches; everyone else joins them.
+        Returns the number of messages added.
+        """
+        send_date = str(send_date)
+        with self._transaction():
+            if self.db.execute("SELECT 1 FROM messages WHERE send_date = ? LIMIT 1", (send_date,)).fetchone():
+                return 0
+            for start in range(0, len(messages), batch_size):
+                batch_id = self.db.execute("INSERT INTO batches (send_date) VALUES (?)", (send_date,)).lastrowid
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO messages (batch_id, send_date, row_index, date_column, email) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(batch_id, send_date, int(row), column, email)
+                     for row, column, email in messages[start:start + batch_size]])
+        return len(messages)
+
+    def claim(self, send_date, operator):
+        """Lease the next open (or abandoned) batch for a date.
+
+        Returns (batch_id, [(message_id, row_index, date_column, email), ...]) with only
+        the messages still pending, or None when nothing is left to claim.
+        """
+        now = time.time()
+        with self._transaction():
+            while True:
+                batch = self.db.execute(
+                    "SELECT id FROM batches WHERE send_date = ? AND "
+                    "(status = 'OPEN' OR (status = 'LEASED' AND lease_expires < ?)) ORDER BY id LIMIT 1",
+                    (str(send_date), now)).fetchone()
+                if batch is None:
+                    return None
+                batch_id = batch[0]
+                messages = self.db.execute(
+                    "SELECT id, row_index, date_column, email FROM messages "
+                    "WHERE batch_id = ? AND status = 'PENDING' ORDER BY id", (batch_id,)).fetchall()
+                if messages:
+                    self.db.execute("UPDATE batches SET status = 'LEASED', operator = ?, lease_expires = ? "
+                                    "WHERE id = ?", (operator, now + self.lease_seconds, batch_id))
+                    return batch_id, messages
+                # Everything was already sent before the lease ran out
+                self.db.execute("UPDATE batches SET status = 'DONE' WHERE id = ?", (batch_id,))
+
+    def is_pending(self, message_id):
+        """False once someone has acknowledged the message (check right before sending)."""
+        row = self.db.execute("SELECT status FROM messages WHERE id = ?", (message_id,)).fetchone()
+        return row is not None and row[0] == 'PENDING'
+
+    def ack(self, batch_id, message_id, operator):
+        """Record a sent message and extend the lease.
+
+        Returns False if the lease was lost (it expired and another operator claimed the
+        batch); the message is still recorded as sent, but the rest of the batch is theirs.
+        """
+        return self.ack_many(batch_id, [message_id], operator)
+
+    def ack_many(self, batch_id, message_ids, operator):
+        """Record several sent messages of a batch in one transaction (see ack)."""
+        now = time.time()
+        with self._transaction():
+            self.db.executemany("UPDATE messages SET status = 'DONE', operator = ?, done_at = ? "
+                                "WHERE id = ? AND status = 'PENDING'",
+                                [(operator, now, message_id) for message_id in message_ids])
+            renewed = self.db.execute(
+                "UPDATE batches SET lease_expires = ? WHERE id = ? AND status = 'LEASED' AND operator = ?",
+                (now + self.lease_seconds, batch_id, operator)).rowcount
+        return renewed == 1
+
+    def skip(self, message_ids, status='SKIPPED'):
+        """Give messages that cannot be sent a final status.
+
+        SKIPPED: never attempted (no email, no template). FAILED: rejected by the mail
+        server; merge_done writes it into the workbook like DONE.
+        Only PENDING messages are ever claimed or keep a batch open, so without this a
+        batch with an unsendable message would be handed out again and again.
+        """
+        with self._transaction():
+            self.db.executemany("UPDATE messages SET status = ? WHERE id = ? AND status = 'PENDING'",
+                                [(status, message_id) for message_id in message_ids])
+
+    def finish(self, batch_id, operator):
+        """Close a leased batch: DONE if every message was sent, otherwise back to OPEN."""
+        with self._transaction():
+            pending = self.db.execute("SELECT COUNT(*) FROM messages WHERE batch_id = ? AND status = 'PENDING'",
+                                      (batch_id,)).fetchone()[0]
+            self.db.execute("UPDATE batches SET status = ?, operator = NULL, lease_expires = NULL "
+                            "WHERE id = ? AND operator = ?",
+                            ('OPEN' if pending else 'DONE', batch_id, operator))
+
+    def progress(self, send_date):
+        """Message counts per status for a date."""
+        rows = self.db.execute("SELECT status, COUNT(*) FROM messages WHERE send_date = ? GROUP BY status",
+                               (str(send_date),)).fetchall()
+        return dict(rows)
+
+    def merge_done(self, workbook_path, email_column="Email"):
+        """Write "DONE" (or "FAILED") into the workbook for every finished message not merged yet.
+
+        Merges are serialized by a lock of their own and the workbook is replaced
+        atomically, so operators merging at the same time never lose each other's
+        updates. The queue is only locked for the two short transactions at the start
+        and the end (a read, then the MERGED update), so claims and acknowledgements go
+        on during the workbook load and save. If a merge stops in between, the next one
+        writes the same cells again, which is harmless.
+        If the workbook was rescored and a lead moved, it is found again by email.
+        Returns the number of cells updated.
+        """
+        with self._merge_lock():
+            done = self.db.execute("SELECT id, row_index, date_column, email, status FROM messages "
+                                   "WHERE status IN ('DONE', 'FAILED')").fetchall()
+            if not done:
+                return 0
+
+            wb = load_workbook(workbook_path)
+            ws = wb.active
+            headers = {cell.value: cell.column for cell in ws[1]}
+            email_col = headers.get(email_column)
+            rows_by_email = None
+            updated = 0
+            for _, row_index, date_column, email, status in done:
+                excel_row = row_index + 2  # header row, 1-based
+                if email_col and ws.cell(row=excel_row, column=email_col).value != email:
+                    if rows_by_email is None:
+                        rows_by_email = {ws.cell(row=r, column=email_col).value: r
+                                         for r in range(2, ws.max_row + 1)}
+                    excel_row = rows_by_email.get(email)
+                if excel_row is None or date_column not in headers:
+                    print(f"⚠️ Could not find {date_column} for {email} in {workbook_path}.")
+                    continue
+                ws.cell(row=excel_row, column=headers[date_column], value=status)
+                updated += 1
+
+            replace_workbook(wb, workbook_path)
+            with self._transaction():
+                self.db.executemany("UPDATE messages SET status = 'MERGED' WHERE id = ?",
+                                    [(message_id,) for message_id, _, _, _, _ in done])
+        return updated
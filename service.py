@@ -0,0 +1,223 @@
+"""Local HTTP service that scores new leads the moment they are created.
+
+Loads the model saved by analyze_data.py (lead_model.joblib) once, then answers:
+    POST /score   one lead as a JSON object, or a batch as a JSON list
+    GET  /health
+
+Each lead needs Previous Purchases, Time Since Last Purchase and
+Average Purchase Value (SEK); Industry, City and Lead Source are optional.
+The response has Purchase Score, Lifetime Value, Lead Score and Next Follow-up Date.
+
+Concurrent requests are collected into micro-batches (up to --max-batch leads or
+--max-wait-ms milliseconds) and scored with one vectorized model call.
+
+    python service.py --model lead_model.joblib --port 8080
+"""
+import argparse
+import asyncio
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+
+from scoring import CATEGORICAL_FEATURES, FOLLOW_UP_TIERS, NUMERIC_FEATURES, load_model, score_leads
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+FOLLOW_UP_DAYS = np.array([days for _, days in FOLLOW_UP_TIERS])
+
+
+class BadRequest(Exception):
+    pass
+
+
+def leads_frame(leads):
+    """Validate a list of lead dicts and turn it into the DataFrame the model expects."""
+    df = pd.DataFrame.from_records(leads)
+    missing = [col for col in NUMERIC_FEATURES if col not in df.columns]
+    if missing:
+        raise BadRequest(f"Missing field(s): {', '.join(missing)}")
+    for col in NUMERIC_FEATURES:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+        if not np.isfinite(df[col].to_numpy(dtype=np.float64)).all():  # also rejects 1e999 and Infinity
+            raise BadRequest(f"'{col}' must be a finite number for every lead")
+    for col in CATEGORICAL_FEATURES:
+        if col not in df.columns:
+            df[col] = np.nan
+    return df
+
+
+def score_batch(bundle, leads):
+    """Score a list of lead dicts; returns one result dict per lead."""
+    scores = score_leads(bundle, leads_frame(leads))
+    today = datetime.date.today()
+    next_dates = [(today + datetime.timedelta(days=int(days))).isoformat()
+                  for days in FOLLOW_UP_DAYS[scores['Follow-up Tier'].to_numpy()]]
+    return [
+        {'Purchase Score': float(p), 'Lifetime Value': float(ltv), 'Lead Score': float(score),
+         'Next Follow-up Date': next_date}
+        for p, ltv, score, next_date in zip(scores['Purchase Score'], scores['Lifetime Value'],
+                                            scores['Lead Score'], next_dates)
+    ]
+
+
+class MicroBatcher:
+    """Groups leads from concurrent requests into one vectorized scoring call."""
+
+    def __init__(self, bundle, max_batch=256, max_wait=0.002):
+        self.bundle = bundle
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+
+    async def score(self, leads):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((leads, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            # One model call for everything that arrived; the event loop keeps accepting meanwhile
+            leads = [lead for request_leads, _ in pending for lead in request_leads]
+            try:
+                results = await loop.run_in_executor(None, score_batch, self.bundle, leads)
+            except Exception:
+                # Score the requests one by one (still off the event loop) so only the bad one fails
+                for request_leads, future in pending:
+                    try:
+                        result = await loop.run_in_executor(None, score_batch, self.bundle, request_leads)
+                    except Exception as error:
+                        if not future.done():
+                            future.set_exception(error)
+                    else:
+                        if not future.done():  # the client may have disconnected meanwhile
+                            future.set_result(result)
+                continue
+
+            start = 0
+            for request_leads, future in pending:
+                if not future.done():
+                    future.set_result(results[start:start + len(request_leads)])
+                start += len(request_leads)
+
+
+async def read_request(reader):
+    """Parse one HTTP/1.1 request. Returns (method, path, headers, body) or None at EOF."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise BadRequest("Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length', 0) or 0)
+    if length > MAX_BODY_BYTES:
+        raise BadRequest("Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+
+def write_response(writer, status, payload, keep_alive):
+    reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error'}
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {reasons[status]}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+
+
+async def handle_connection(reader, writer, batcher):
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except (BadRequest, ValueError) as error:
+                write_response(writer, 400, {'error': str(error)}, keep_alive=False)
+                break
+            if request is None:
+                break
+            method, path, headers, body = request
+            keep_alive = headers.get('connection', '').lower() != 'close'
+
+            if path == '/health':
+                write_response(writer, 200, {'status': 'ok'}, keep_alive)
+            elif path != '/score':
+                write_response(writer, 404, {'error': f"Unknown path {path}"}, keep_alive)
+            elif method != 'POST':
+                write_response(writer, 405, {'error': "Use POST"}, keep_alive)
+            else:
+                try:
+                    payload = json.loads(body or b'null')
+                    single = isinstance(payload, dict)
+                    leads = [payload] if single else payload
+                    if not isinstance(leads, list) or not all(isinstance(lead, dict) for lead in leads):
+                        raise BadRequest("Send a lead object or a list of lead objects")
+                    results = await batcher.score(leads) if leads else []
+                    write_response(writer, 200, results[0] if single else results, keep_alive)
+                except (BadRequest, json.JSONDecodeError) as error:
+                    write_response(writer, 400, {'error': str(error)}, keep_alive)
+                except Exception as error:
+                    write_response(writer, 500, {'error': str(error)}, keep_alive)
+
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(model_path, host, port, max_batch, max_wait_ms):
+    batcher = MicroBatcher(load_model(model_path), max_batch, max_wait_ms / 1000)
+    batch_task = asyncio.create_task(batcher.run())
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(r, w, batcher), host, port, backlog=1024)
+    print(f"Scoring leads on http://{host}:{port}/score (model: {model_path})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score new leads over HTTP.")
+    parser.add_argument("--model", default="lead_model.joblib", help="model saved by analyze_data.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch", type=int, default=256, help="most leads scored in one model call")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="how long to wait for more requests before scoring a batch")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.model, args.host, args.port, args.max_batch, args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
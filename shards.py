@@ -0,0 +1,132 @@
+"""Sharded input: many lead workbooks (e.g. one per region) treated as one table.
+
+An input setting can name one file, a glob ("leads/*.xlsx") or a manifest file
+(.txt, one path per line, relative to the manifest; '#' starts a comment).
+Shards are read in parallel worker processes (map) and combined in the order
+they are listed (reduce), so every result is the same as for the concatenated file.
+
+Each shard also returns partial statistics that merge exactly:
+- numeric moments (row count, sum, sum of squares) for the scaler; the purchase
+  columns are integers, so the sums are exact and do not depend on the sharding
+- a quantile sketch of historical LTV (for LTV_NORMALIZATION = "sketch")
+"""
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+from dedup import EMAIL_COLUMN, normalize_emails
+from scoring import NUMERIC_FEATURES, historical_ltv, ltv_sketch
+
+MANIFEST_SUFFIXES = ('.txt', '.lst', '.manifest')
+
+
+def resolve_shards(spec):
+    """List the input files for a file name, glob pattern or manifest file."""
+    if glob.has_magic(spec):
+        paths = sorted(glob.glob(spec))
+    elif spec.lower().endswith(MANIFEST_SUFFIXES):
+        base = os.path.dirname(spec)
+        with open(spec, encoding="utf-8") as f:
+            lines = (line.split('#', 1)[0].strip() for line in f)
+            paths = [os.path.join(base, line) for line in lines if line]
+    else:
+        paths = [spec]
+    if not paths:
+        raise FileNotFoundError(f"No input files match '{spec}'")
+    return paths
+
+
+def map_shards(func, paths, workers=None):
+    """Run func(path) for every shard in worker processes; results in shard order."""
+    if len(paths) == 1 or workers == 1:
+        return [func(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(paths))) as pool:
+        return list(pool.map(func, paths))
+
+
+# -----------------------------
+# Scaler moments
+# -----------------------------
+def numeric_moments(df, columns=NUMERIC_FEATURES):
+    """Row count, sum and sum of squares per column (Python ints for integer columns)."""
+    moments = {}
+    for col in columns:
+        values = df[col].to_numpy()
+        if np.issubdtype(values.dtype, np.integer):
+            values = values.astype(np.int64)
+            moments[col] = (len(values), int(values.sum()), int((values * values).sum()))
+        else:
+            values = values.astype(np.float64)
+            moments[col] = (len(values), float(values.sum()), float((values * values).sum()))
+    return moments
+
+
+def merge_moments(*parts, sign=1):
+    """Add (or, with sign=-1, remove) moments; exact for integer columns."""
+    merged = dict(parts[0])
+    for part in parts[1:]:
+        for col, (n, total, squares) in part.items():
+            n0, total0, squares0 = merged[col]
+            merged[col] = (n0 + sign * n, total0 + sign * total, squares0 + sign * squares)
+    return merged
+
+
+def deduplicated_moments(moments, raw, deduplicated):
+    """Moments of the deduplicated table from the moments of the raw rows.
+
+    Only the rows that deduplicate_leads merged change: their raw rows are removed
+    and the merged rows added back.
+    """
+    if len(raw) == len(deduplicated):
+        return moments
+    emails = normalize_emails(raw[EMAIL_COLUMN])
+    duplicated = emails.notna() & emails.duplicated(keep=False)
+    merged_rows = normalize_emails(deduplicated[EMAIL_COLUMN]).isin(emails[duplicated])
+    moments = merge_moments(moments, numeric_moments(raw[duplicated.to_numpy()]), sign=-1)
+    return merge_moments(moments, numeric_moments(deduplicated[merged_rows.to_numpy()]))
+
+
+def apply_moments(preprocessor, moments):
+    """Set the fitted StandardScaler's mean and variance from exact moments.
+
+    The same moments give the same scaler whether they were summed over one file or
+    merged from shards, so the scaled features (and the scores) are identical.
+    """
+    scaler = preprocessor.named_transformers_['numeric']
+    mean, var = [], []
+    for col in scaler.feature_names_in_:
+        n, total, squares = moments[col]
+        if isinstance(total, int):
+            mean.append(total / n)
+            var.append(float(Fraction(n * squares - total * total, n * n)))
+        else:
+            mean.append(total / n)
+            var.append(max(squares / n - (total / n) ** 2, 0.0))
+    scaler.mean_ = np.array(mean)
+    scaler.var_ = np.array(var)
+    scaler.scale_ = np.where(scaler.var_ == 0, 1.0, np.sqrt(scaler.var_))  # constant columns are left unscaled
+    return preprocessor
+
+
+# -----------------------------
+# Map and reduce for analyze_data.py
+# -----------------------------
+def read_lead_shard(path):
+    """Map: parse one shard and compute its partial statistics."""
+    df = pd.read_excel(path, engine='openpyxl')
+    return df, numeric_moments(df), ltv_sketch(historical_ltv(df))
+
+
+def read_leads(paths, workers=None):
+    """Reduce: the concatenated leads, their numeric moments and an LTV sketch."""
+    results = map_shards(read_lead_shard, paths, workers)
+    df = pd.concat([frame for frame, _, _ in results], ignore_index=True)
+    moments = merge_moments(*[moments for _, moments, _ in results])
+    sketch = results[0][2]
+    for _, _, shard_sketch in results[1:]:
+        sketch.merge(shard_sketch)
+    return df, moments, sketch
@@ -0,0 +1,275 @@
+"""Asynchronous SMTP delivery of rendered messages (standard library only).
+
+DeliveryEngine keeps a bounded pool of persistent SMTP connections, one per worker
+task, and reuses each connection for many messages (RSET between failures, QUIT at
+the end) instead of opening a new session per email. On top of that:
+- a shared per-second rate limit (sends spaced evenly)
+- retries with exponential backoff for temporary failures (4xx replies, dropped
+  connections, timeouts); permanent 5xx replies fail at once, and messages that
+  still fail after the last retry are reported as deferred
+- results collected and handed to a callback in batches, so the lead store is
+  written once per batch rather than once per message
+
+    engine = DeliveryEngine("smtp.example.com", 587, "sales@example.com", starttls=True,
+                            username="sales@example.com", password=os.environ["SMTP_PASSWORD"])
+    asyncio.run(engine.deliver([(key, to, subject, body), ...], write_results))
+"""
+import asyncio
+import base64
+import csv
+import os
+import random
+import ssl
+import time
+from datetime import datetime
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+from email.utils import formatdate, make_msgid
+
+MAX_CONNECTIONS = 4
+RATE_PER_SECOND = None
+RETRIES = 3
+BACKOFF_SECONDS = 1.0
+RESULT_BATCH = 100
+TIMEOUT_SECONDS = 30
+LOG_COLUMNS = ["Time", "Send Date", "Email", "Message", "Status", "Detail"]
+
+
+class SMTPError(Exception):
+    def __init__(self, code, text):
+        super().__init__(f"{code} {text}")
+        self.code = code
+
+    @property
+    def temporary(self):
+        return 400 <= self.code < 500
+
+
+def build_message(sender, recipient, subject, body):
+    """RFC 5322 bytes (CRLF line endings, UTF-8) for one plain-text email."""
+    message = EmailMessage(policy=SMTP_POLICY)
+    message['From'] = sender
+    message['To'] = recipient
+    message['Subject'] = subject
+    message['Date'] = formatdate(localtime=True)
+    message['Message-ID'] = make_msgid()
+    message.set_content(body)
+    return message.as_bytes()
+
+
+def log_results(log_path, send_date, write_back):
+    """A write_results callback for DeliveryEngine.deliver that keeps a CSV log.
+
+    Every batch of results is appended to the log (one line per message) and then handed
+    to write_back(sent_keys, failed_keys); deferred messages are only logged.
+    Keys are (id, message name, email) tuples.
+    """
+    def write_results(results):
+        now = datetime.now().isoformat(timespec="seconds")
+        new_log = not os.path.exists(log_path)
+        with open(log_path, "a", newline="", encoding="utf-8") as f:
+            log = csv.writer(f)
+            if new_log:
+                log.writerow(LOG_COLUMNS)
+            log.writerows([now, send_date, key[2], key[1], status, detail] for key, status, detail in results)
+        write_back([key for key, status, _ in results if status == "SENT"],
+                   [key for key, status, _ in results if status == "FAILED"])
+    return write_results
+
+
+class SMTPConnection:
+    """One SMTP session over asyncio streams (EHLO, optional TLS/STARTTLS and AUTH PLAIN)."""
+
+    def __init__(self, host, port, use_tls=False, starttls=False, username=None, password=None,
+                 timeout=TIMEOUT_SECONDS):
+        self.host, self.port = host, port
+        self.use_tls, self.starttls = use_tls, starttls
+        self.username, self.password = username, password
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    @property
+    def connected(self):
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def connect(self):
+        context = ssl.create_default_context() if self.use_tls or self.starttls else None
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context if self.use_tls else None), self.timeout)
+        await self._reply(220)
+        await self.command("EHLO lead-scoring", 250)
+        if self.starttls:
+            await self.command("STARTTLS", 220)
+            await self.writer.start_tls(context, server_hostname=self.host)
+            await self.command("EHLO lead-scoring", 250)
+        if self.username:
+            token = base64.b64encode(f"\0{self.username}\0{self.password}".encode("utf-8")).decode("ascii")
+            await self.command(f"AUTH PLAIN {token}", 235)
+
+    async def _reply(self, expected):
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            if not line:
+                raise ConnectionError("SMTP server closed the connection")
+            lines.append(line.decode("utf-8", "replace").rstrip())
+            if line[3:4] != b"-":
+                break
+        code, text = int(lines[-1][:3]), " ".join(line[4:] for line in lines)
+        if code != expected:
+            raise SMTPError(code, text)
+        return text
+
+    async def command(self, line, expected):
+        self.writer.write(line.encode("utf-8") + b"\r\n")
+        await self.writer.drain()
+        return await self._reply(expected)
+
+    async def send(self, sender, recipient, data):
+        await self.command(f"MAIL FROM:<{sender}>", 250)
+        await self.command(f"RCPT TO:<{recipient}>", 250)
+        await self.command("DATA", 354)
+        # Dot-stuffing: a line that starts with "." gets a second one
+        data = data.replace(b"\r\n.", b"\r\n..")
+        if data.startswith(b"."):
+            data = b"." + data
+        if not data.endswith(b"\r\n"):
+            data += b"\r\n"
+        self.writer.write(data + b".\r\n")
+        await self.writer.drain()
+        return await self._reply(250)
+
+    async def reset(self):
+        await self.command("RSET", 250)
+
+    async def close(self):
+        if self.connected:
+            try:
+                await self.command("QUIT", 221)
+            except (OSError, SMTPError, asyncio.TimeoutError):
+                pass
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class RateLimiter:
+    """Shared by all workers: at most `rate` sends per second (None = unlimited).
+
+    A token bucket holding a single token, so sends are spaced 1/rate apart and no
+    burst at the start can exceed the limit within any one second.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = 1
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.rate:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(1, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class DeliveryEngine:
+    """Sends (key, recipient, subject, body) messages over a pool of persistent connections."""
+
+    def __init__(self, host, port, sender, max_connections=MAX_CONNECTIONS, rate=RATE_PER_SECOND,
+                 retries=RETRIES, backoff=BACKOFF_SECONDS, result_batch=RESULT_BATCH,
+                 use_tls=False, starttls=False, username=None, password=None, timeout=TIMEOUT_SECONDS):
+        self.sender = sender
+        self.max_connections = max_connections
+        self.rate = rate
+        self.retries, self.backoff = retries, backoff
+        self.result_batch = result_batch
+        self.connection_args = dict(host=host, port=port, use_tls=use_tls, starttls=starttls,
+                                    username=username, password=password, timeout=timeout)
+
+    async def deliver(self, messages, write_results):
+        """Send every message; calls write_results([(key, status, detail), ...]) per batch.
+
+        status is "SENT", "FAILED" (permanent: the server rejected the message or it could
+        not be built, e.g. a header with a line break) or "DEFERRED" (only temporary
+        failures until the retries ran out; worth trying again later). Every message gets
+        a result, and results already collected are written even if delivery is interrupted.
+        Returns a dict with the number of messages per status.
+        """
+        queue = asyncio.Queue()
+        for message in messages:
+            queue.put_nowait(message)
+        limiter = RateLimiter(self.rate)
+        pending, totals = [], {"SENT": 0, "FAILED": 0, "DEFERRED": 0}
+
+        def flush():
+            batch = pending[:]
+            pending.clear()
+            write_results(batch)
+
+        def record(key, status, detail):
+            pending.append((key, status, detail))
+            totals[status] += 1
+            if len(pending) >= self.result_batch:
+                flush()
+
+        async def worker():
+            connection = SMTPConnection(**self.connection_args)
+            try:
+                while not queue.empty():
+                    key, recipient, subject, body = queue.get_nowait()
+                    try:
+                        data = build_message(self.sender, recipient, subject, body)
+                        status, detail = await self._send_with_retries(connection, limiter, recipient, data)
+                    except Exception as error:  # one bad message must not stop the others
+                        await connection.close()  # the session state is unknown
+                        status, detail = "FAILED", f"{type(error).__name__}: {error}"
+                    record(key, status, detail)
+            finally:
+                await connection.close()
+
+        workers = min(self.max_connections, queue.qsize()) or 1
+        try:
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        finally:
+            if pending:
+                flush()
+        return totals
+
+    async def _send_with_retries(self, connection, limiter, recipient, data):
+        for attempt in range(self.retries + 1):
+            try:
+                if not connection.connected:
+                    try:
+                        await connection.connect()
+                    except SMTPError as error:
+                        # Greeting, STARTTLS or login refused: not this message's fault, so never permanent
+                        raise ConnectionError(f"could not open a session: {error}") from error
+                await limiter.wait()
+                return "SENT", await connection.send(self.sender, recipient, data)
+            except SMTPError as error:
+                if not error.temporary:
+                    await self._reset(connection)
+                    return "FAILED", str(error)
+                detail = str(error)
+                await self._reset(connection)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as error:
+                detail = f"{type(error).__name__}: {error}"
+                await connection.close()  # reconnect on the next attempt
+            if attempt < self.retries:
+                # Exponential backoff with jitter so workers do not retry in lockstep
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+        return "DEFERRED", f"gave up after {self.retries + 1} attempts: {detail}"
+
+    async def _reset(self, connection):
+        """Abort the current transaction but keep the session (fall back to reconnecting)."""
+        try:
+            await connection.reset()
+        except (OSError, SMTPError, asyncio.TimeoutError):
+            await connection.close()
@@ -0,0 +1,141 @@
+"""Persistent record of every message already sent, so nothing is sent twice.
+
+The "DONE" written into a date cell is lost when analyze_data.py rescores the leads
+and regenerates the date columns. This index lives in its own files instead:
+    sent_messages.sqlite      set of sent keys (Email, message kind, promo number, date)
+    sent_messages.bloom.npz   Bloom filter over the same keys, loaded into memory
+
+Keys are stored as 64-bit BLAKE2 digests rather than text: about 40 bytes per sent
+message on disk including the index, so tens of millions of entries stay small. This
+deliberately gives up an exact set of keys: two different keys share a digest with a
+probability of 2^-64 per pair, so at 10 million sent messages an unsent message is
+mistaken for a sent one (and skipped) about once in 10^12 lookups. A message that was
+sent is never missed.
+
+Messages without an email address have no key: they are never recorded and never
+suppressed.
+
+A lookup first checks the Bloom filter (a few bit tests, no disk access). Only when it
+answers "maybe" (the message was sent, or a ~1% false positive) is the SQLite set
+consulted, so the answer does not depend on the filter. At the default capacity of
+10 million keys the filter takes about 12 MB of memory; it is rebuilt twice as large
+when it fills up.
+
+The filter in memory only knows the keys that existed when it was loaded (or last
+refreshed) plus the ones this process added. When other processes record sends at
+the same time (work-queue mode), call refresh() before each round of lookups.
+"""
+import hashlib
+import math
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+SUPPRESSION_FILE = "sent_messages.sqlite"
+CAPACITY = 10_000_000
+ERROR_RATE = 0.01
+
+
+def suppression_key(email, kind, promo_number, send_date):
+    """Key of one sent message, or None without an email; emails are compared trimmed and lower-cased."""
+    if not isinstance(email, str) or not email.strip():
+        return None  # a missing email (NaN, None, blank) must not match every other missing one
+    return "|".join([email.strip().lower(), kind, str(promo_number or ""), str(send_date)])
+
+
+def key_digest(key):
+    """Signed 64-bit BLAKE2 digest of a key (fits a SQLite INTEGER)."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+class BloomFilter:
+    """Bit array with k hash positions per digest (double hashing of its two 32-bit halves)."""
+
+    def __init__(self, capacity=CAPACITY, error_rate=ERROR_RATE, bits=None, hashes=None):
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+        self.size = len(self.bits) * 8
+        self.hashes = hashes or max(1, round(self.size / capacity * math.log(2)))
+
+    def _positions(self, digest):
+        h1, h2 = digest & 0xFFFFFFFF, ((digest >> 32) & 0xFFFFFFFF) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, digest):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, digest):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class SuppressionIndex:
+    """Set of sent messages on disk with a Bloom filter in front of it."""
+
+    def __init__(self, path=SUPPRESSION_FILE, capacity=CAPACITY, error_rate=ERROR_RATE):
+        self.path = path
+        self.bloom_path = os.path.splitext(path)[0] + ".bloom.npz"
+        self.error_rate = error_rate
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS sent (id INTEGER PRIMARY KEY, "
+                        "digest INTEGER NOT NULL UNIQUE, sent_at INTEGER)")
+        self.db.commit()
+
+        self.bloom, self.last_id = None, 0
+        if os.path.exists(self.bloom_path):
+            saved = np.load(self.bloom_path)
+            self.bloom = BloomFilter(int(saved["capacity"]), error_rate, saved["bits"], int(saved["hashes"]))
+            self.capacity, self.last_id = int(saved["capacity"]), int(saved["last_id"])
+        entries = self.db.execute("SELECT COALESCE(MAX(id), 0) FROM sent").fetchone()[0]
+        if self.bloom is None or entries > self.capacity:
+            self._rebuild(max(capacity, 2 * entries))
+        else:
+            self.refresh()
+
+    def _rebuild(self, capacity):
+        self.capacity = capacity
+        self.bloom, self.last_id = BloomFilter(capacity, self.error_rate), 0
+        self.refresh()
+
+    def refresh(self):
+        """Add keys that other processes recorded since this filter was last updated."""
+        for key_id, digest in self.db.execute("SELECT id, digest FROM sent WHERE id > ? ORDER BY id",
+                                              (self.last_id,)):
+            self.bloom.add(digest)
+            self.last_id = key_id
+
+    def __contains__(self, key):
+        if key is None:
+            return False  # no email: never recorded
+        digest = key_digest(key)
+        if digest not in self.bloom:
+            return False  # never sent, as of the last refresh
+        return self.db.execute("SELECT 1 FROM sent WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def add(self, key):
+        """Record a sent message (adding the same key again is a no-op)."""
+        self.add_many([key])
+
+    def add_many(self, keys):
+        digests = [key_digest(key) for key in keys if key is not None]
+        now = int(time.time())
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO sent (digest, sent_at) VALUES (?, ?)",
+                                [(digest, now) for digest in digests])
+        for digest in digests:
+            self.bloom.add(digest)
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM sent").fetchone()[0]
+
+    def close(self):
+        """Save the Bloom filter (atomically) so the next run does not rebuild it."""
+        self.refresh()
+        tmp = f"{self.bloom_path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp, bits=np.frombuffer(self.bloom.bits, dtype=np.uint8), hashes=self.bloom.hashes,
+                            capacity=self.capacity, last_id=self.last_id)
+        os.replace(tmp, self.bloom_path)
+        self.db.close()
@@ -0,0 +1,84 @@
+"""What-if sweep over the purchase target threshold and the Lead Score weighting.
+
+Runs against the feature cache written by analyze_data.py, so nothing is re-parsed
+or re-scaled: every worker process maps the same cached arrays zero-copy.
+For each threshold the model is refit once; every weighting is then just a rescore.
+
+    python analyze_data.py          # builds the cache on first run
+    python whatif.py --thresholds 100 150 200 250 300 --weights 0.1 0.2 0.3 0.4 0.5
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from feature_cache import CACHE_DIR, load_arrays, source_key
+from scoring import (FOLLOW_UP_TIERS, PURCHASE_TARGET_DAYS, WEIGHT_ADJUSTMENT, build_classifier,
+                     follow_up_days, ltv_stats_exact, normalize_ltv, quantized_lead_scores)
+from shards import resolve_shards
+
+
+def sweep_threshold(key, categorical, threshold, weights, cache_dir=CACHE_DIR):
+    """Fit the purchase model for one target threshold and score it with every weighting."""
+    cached = load_arrays(key, cache_dir)
+    X, ltv = cached["X"], cached["ltv"]
+    y = (cached["recency"] < threshold).astype(int)
+
+    if y.min() == y.max():
+        purchase = np.full(len(y), float(y[0]))  # only one class: nothing to learn
+    else:
+        model = build_classifier(categorical).fit(X, y)
+        purchase = np.round(model.predict_proba(X)[:, 1], 2)
+    ltv_normalized = normalize_ltv(ltv, *ltv_stats_exact(ltv))
+
+    rows = []
+    for weight in weights:
+        score = quantized_lead_scores(purchase, ltv_normalized, weight)
+        days = follow_up_days(score)
+        row = {"Target Days": threshold, "Weight Adjustment": weight,
+               "Average Purchase Score": purchase.mean(), "Average Lead Score": score.mean()}
+        for low, interval in FOLLOW_UP_TIERS:
+            row[f"Tier >= {low:.1f} (%)"] = (days == interval).mean() * 100
+        rows.append((row, days))
+    return rows
+
+
+def run_sweep(key, categorical, thresholds, weights, workers=None, cache_dir=CACHE_DIR):
+    """Sweep all thresholds in parallel; returns one summary row per (threshold, weighting)."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(sweep_threshold, key, categorical, t, weights, cache_dir)
+                   for t in thresholds]
+        results = [row for future in futures for row in future.result()]
+
+    # Compare every combination with the current settings
+    baseline = sweep_threshold(key, categorical, PURCHASE_TARGET_DAYS, [WEIGHT_ADJUSTMENT], cache_dir)[0][1]
+    summary = []
+    for row, days in results:
+        row["Leads Changing Tier (%)"] = (days != baseline).mean() * 100
+        summary.append(row)
+    return pd.DataFrame(summary)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep purchase target threshold and Lead Score weighting.")
+    parser.add_argument("--input", default="demo_leads.xlsx", help="source file, glob or manifest analyze_data.py scored")
+    parser.add_argument("--numeric-only", action="store_true",
+                        help="use the cache built with USE_CATEGORICAL_FEATURES = False")
+    parser.add_argument("--thresholds", type=int, nargs="+", default=[100, 150, 200, 250, 300])
+    parser.add_argument("--weights", type=float, nargs="+", default=[0.1, 0.2, 0.3, 0.4, 0.5])
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--output", default="whatif_sweep.xlsx")
+    args = parser.parse_args()
+
+    categorical = not args.numeric_only
+    key = source_key(resolve_shards(args.input), categorical)
+    if not os.path.exists(os.path.join(CACHE_DIR, key)):
+        raise SystemExit(f"No cached features for '{args.input}'. Run analyze_data.py first.")
+
+    summary = run_sweep(key, categorical, args.thresholds, args.weights, args.workers)
+    pd.set_option("display.width", 200)
+    print(summary.round(2).to_string(index=False))
+    summary.to_excel(args.output, index=False, engine='openpyxl')
+    print(f"\nSaved to '{args.output}'.")